@@ -0,0 +1,227 @@
+"""Run time and memory of the data-prep and parsing hot paths on synthetic sheets.
+
+    python benchmarks/hot_paths.py                       # 1k, 10k, 100k and 1M rows
+    python benchmarks/hot_paths.py --sizes 1000 10000    # quicker (what CI runs)
+    python benchmarks/hot_paths.py --compare benchmarks/results/<base commit>.json   # flag regressions
+
+Results are saved to benchmarks/results/<commit>.json (with a -dirty suffix
+for uncommitted trees). Timings only mean something next to a run on the same
+machine, so `--compare` takes the results of another run rather than a stored
+baseline: CI benchmarks the base commit in the same job and compares with that.
+"""
+import os
+import sys
+import json
+import time
+import random
+import statistics
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+from data_sources import MemoryWorksheet
+from sheet_snapshot import SheetSnapshot, FEEDBACK_SCHEMA
+from prompt_compaction import compact_feedback, shard_feedback, RECENT_TOKEN_BUDGET
+import structured_output
+from structured_output import ExportPlan, ProspectList, OutreachDraft
+from cmo_guide import export_tasks_from_lines, export_rows
+from sales_crews import prospects_from_lines, prospect_rows, outreach_from_sections
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# A benchmark counts as a regression when it is this much slower (or hungrier) than the base run
+REGRESSION_RATIO = 1.5
+# ...and the change is bigger than run-to-run noise
+NOISE_FLOOR = {"seconds": 0.01, "peak_mb": 1.0}
+
+LOCATIONS = ["Kuala Lumpur", "Penang", "Melaka", "Ipoh", "Langkawi", "Johor Bahru", "Kota Kinabalu", "Kuching"]
+PHRASES = [
+    "the map did not load", "itinerary was perfect", "suggested places were closed",
+    "too far to walk", "loved the food picks", "app crashed after login",
+    "results were in the wrong city", "please add hotel bookings",
+]
+
+
+def feedback_grid(rows, seed=7):
+    """A JomPlan-style sheet: instructions in row 1, headers in row 2, a year of feedback below."""
+    rng = random.Random(seed)
+    start = pd.Timestamp.now().floor("s") - pd.Timedelta(days=365)
+    step = 365 * 86400 / rows
+    grid = [["Instructions: one row per chat session"], ["Timestamp", "Location", "Rating", "Feedback", "Email"]]
+    for i in range(rows):
+        ts = start + pd.Timedelta(seconds=int(i * step))
+        grid.append([
+            ts.strftime("%d/%m/%Y %H:%M:%S"),
+            rng.choice(LOCATIONS),
+            str(rng.randint(1, 5)),
+            f"{rng.choice(PHRASES)}; {rng.choice(PHRASES)}",
+            f"user{rng.randint(1, rows // 3 + 1)}@example.com",
+        ])
+    return grid
+
+
+def crew_output(lines, kind):
+    """Synthetic LLM output with `lines` lines in the shape each parser expects."""
+    if kind == "export":
+        body = [f"<p>Step {i}: keep posting</p>" for i in range(lines)]
+        body[::10] = [f"[EXPORT] | Instagram | Post reel number {i}" for i in range(len(body[::10]))]
+        return "\n".join(body)
+    if kind == "prospects":
+        return "\n".join(f"Company {i} Sdn Bhd | https://company{i}.my | Boutique hotel in Penang" for i in range(lines))
+    if kind == "prospects_json":
+        prospects = [{"company": f"Company {i} Sdn Bhd", "url": f"https://company{i}.my",
+                      "description": "Boutique hotel in Penang"} for i in range(lines)]
+        return json.dumps({"prospects": prospects, "confidence": "high"})
+    sections = ["Viable because they host tourists. " * (lines // 4 + 1), "Jane Tan, General Manager", "jane@company.my",
+                "Subject: Hello\nHi Jane,\n" + "Body line\n" * lines + "Best,\nJom-Plan Team"]
+    return "\n|||\n".join(sections)
+
+
+class Case:
+    """One benchmark: `setup()` builds the inputs (untimed), `run(inputs)` is timed."""
+
+    def __init__(self, name, setup, run):
+        self.name, self.setup, self.run = name, setup, run
+
+
+def build_cases(rows, workdir):
+    grid = feedback_grid(rows)
+    week_ago = pd.Timestamp.now() - pd.Timedelta(days=7)
+    synced = SheetSnapshot(os.path.join(workdir, f"synced_{rows}.sqlite"), header_row=2, schema=FEEDBACK_SCHEMA)
+    synced.sync(MemoryWorksheet(grid))
+    history, recent = synced.windows(week_ago, history_rows=1000)
+    counter = iter(range(10**9))
+
+    def fresh_snapshot():
+        return SheetSnapshot(os.path.join(workdir, f"sync_{rows}_{next(counter)}.sqlite"), header_row=2, schema=FEEDBACK_SCHEMA), MemoryWorksheet(grid)
+
+    def assemble_prompt(frames):
+        recent_users = frames[0].to_dict(orient='records')
+        tracker_data = frames[1].to_dict(orient='records')
+        return f"""Review the Human's recent marketing progress:\n{tracker_data}\n
+    Review the recent Jom-Plan user trends:\n{recent_users}\n"""
+
+    def to_string(sheet):
+        rows = sheet.get_values()
+        df = pd.DataFrame(rows[1:], columns=rows[0])
+        text = df.to_string(index=False)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    return [
+        # 1. Sheet rows -> typed, timestamp-parsed local snapshot (the sync both workers share)
+        Case("snapshot_sync", fresh_snapshot, lambda args: args[0].sync(args[1])),
+        Case("window_select", lambda: synced, lambda snap: snap.windows(week_ago, history_rows=1000)),
+        Case("compact_feedback", lambda: recent, lambda df: compact_feedback(df, RECENT_TOKEN_BUDGET)),
+        # Full history streamed from the snapshot into map-reduce shards (feedback_digest.py)
+        Case("shard_history", lambda: synced, lambda snap: sum(1 for _ in shard_feedback(snap.before(week_ago)))),
+        # 2. to_dict(orient='records') + f-string prompt assembly (cmo_guide.py)
+        Case("prompt_assembly", lambda: (recent, synced.tail(20)), assemble_prompt),
+        # 3. main.py's full-sheet to_string + hash
+        Case("to_string", lambda: MemoryWorksheet(grid), to_string),
+        # 4. Crew answers read through structured_output, scaled to one output line (or item) per row
+        Case("parse_export", lambda: crew_output(rows, "export"),
+             lambda raw: export_rows(structured_output.validated(raw, ExportPlan, export_tasks_from_lines), "01-Jan-2025")),
+        Case("parse_prospects", lambda: crew_output(rows, "prospects"),
+             lambda raw: prospect_rows(structured_output.validated(raw, ProspectList, prospects_from_lines))),
+        Case("parse_prospects_json", lambda: crew_output(rows, "prospects_json"),
+             lambda raw: prospect_rows(structured_output.validated(raw, ProspectList, prospects_from_lines))),
+        Case("parse_outreach", lambda: crew_output(rows, "outreach"),
+             lambda raw: structured_output.validated(raw, OutreachDraft, outreach_from_sections)),
+    ]
+
+
+def measure(case, repeat):
+    # One traced run for peak memory, then untraced runs for time (the median, so one slow run is not a regression)
+    inputs = case.setup()
+    tracemalloc.start()
+    case.run(inputs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        inputs = case.setup()
+        started = time.perf_counter()
+        case.run(inputs)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), peak
+
+
+def commit_label():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous):
+    before = {(r["benchmark"], r["rows"]): r for r in previous["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get((result["benchmark"], result["rows"]))
+        if not old:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            grew = result[metric] - old[metric]
+            if grew > NOISE_FLOOR[metric] and result[metric] > old[metric] * REGRESSION_RATIO:
+                regressions.append(f"{result['benchmark']} @ {result['rows']:,} rows: {metric} "
+                                   f"{old[metric]:.4g} -> {result[metric]:.4g}")
+    print(f"\n📊 Compared with {previous['commit']}:")
+    for line in regressions or ["no regressions"]:
+        print(f"   {line}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case under 100k rows (1 above)")
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--compare", metavar="RESULTS", help="exit 1 if anything regressed vs this results file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            print(f"\n▶️ {rows:,} rows")
+            for case in build_cases(rows, workdir):
+                if args.only and case.name not in args.only:
+                    continue
+                seconds, peak = measure(case, args.repeat if rows < 100_000 else 1)
+                results.append({"benchmark": case.name, "rows": rows,
+                                "seconds": round(seconds, 6), "peak_mb": round(peak / 2**20, 2)})
+                print(f"   {case.name:<22} {seconds * 1000:10.1f} ms {peak / 2**20:9.1f} MB peak")
+
+    report = {
+        "commit": commit_label(),
+        "recorded_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        return 1 if compare(report, base) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
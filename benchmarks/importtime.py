@@ -0,0 +1,87 @@
+"""Cold-start import cost of each entry point, measured with `python -X importtime`.
+
+    python benchmarks/importtime.py                # table on stdout
+    python benchmarks/importtime.py --json out.json
+
+Each entry point is imported in a fresh interpreter `--repeat` times and the
+fastest run is reported, along with its heaviest direct imports and whether
+the crewai stack was loaded (it should not be until a script finds work).
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts the cron workflows start, plus the crew module sales_ops loads once it has work
+ENTRY_POINTS = ["autonomous_worker", "cmo_guide", "sales_ops", "workforce", "sales_crews"]
+HEAVY_PACKAGES = ["crewai", "crewai_tools", "litellm"]
+
+
+def parse_importtime(stderr, module):
+    """Returns (cumulative µs, [(direct import, cumulative µs)], set of every imported name) for `module`."""
+    children = []
+    imported = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+        imported.add(name)
+        if depth == 1:
+            children.append((name, int(cumulative)))
+        elif depth == 0:
+            if name == module:
+                return int(cumulative), sorted(children, key=lambda c: -c[1]), imported
+            children = []
+    raise RuntimeError(f"{module} did not show up in the -X importtime output")
+
+
+def measure(module, repeat):
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        run = parse_importtime(proc.stderr, module)
+        if best is None or run[0] < best[0]:
+            best = run
+    total, children, imported = best
+    return {
+        "module": module,
+        "import_ms": round(total / 1000, 1),
+        "heaviest": [[name, round(us / 1000, 1)] for name, us in children[:5]],
+        "heavy_packages": [pkg for pkg in HEAVY_PACKAGES if pkg in imported],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.repeat) for module in args.modules]
+
+    for result in results:
+        heavy = ", ".join(result["heavy_packages"]) or "-"
+        print(f"{result['module']:<18} {result['import_ms']:9.1f} ms   heavy stacks: {heavy}")
+        for name, ms in result["heaviest"]:
+            print(f"    {name:<30} {ms:9.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
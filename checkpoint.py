@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from paths import CACHE_DIR
+
+# Entries older than this are ignored, so a long-abandoned run is never replayed
+MAX_AGE_SECONDS = float(os.environ.get("CHECKPOINT_MAX_AGE_HOURS", "72")) * 3600
+
+
+class CheckpointJournal:
+    """Append-only JSON-lines journal of per-row progress, so an interrupted run can resume.
+
+    Each row's crew output is written (and fsynced) the moment its crew finishes.
+    The sheet writes still pending for those rows are rebuilt from the saved outputs
+    on the next run, without paying for the crews again. `clear()` once the writes
+    are flushed. Rows are keyed on their content, so an edited row starts over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.outputs = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def for_job(cls, job, source_kind="gsheets"):
+        """The journal of one job's runs against one kind of data source (see data_sources.py)."""
+        return cls(os.path.join(CACHE_DIR, f"{job}_{source_kind}_checkpoint.jsonl"))
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+    def output(self, key):
+        """The saved output for `key`, or None when that row has not finished yet."""
+        return self.outputs.get(key)
+
+    def record_output(self, key, output):
+        entry = {"key": key, "at": time.time(), "output": output}
+        with self._lock:
+            self.outputs[key] = output
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """Forgets every row: their writes have reached the sheet."""
+        with self._lock:
+            self.outputs = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        oldest = time.time() - MAX_AGE_SECONDS
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line torn by the crash that interrupted the run
+            if entry.get("at", 0) >= oldest:
+                self.outputs[entry["key"]] = entry["output"]
@@ -0,0 +1,74 @@
+import os
+import json
+import functools
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+from sheet_snapshot import SheetSnapshot
+from data_sources import GSheetSource, source_from_env
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+PRO_MODEL = "gemini/gemini-3.1-pro-preview"
+
+
+def authorize(*env_vars):
+    """Authorizes gspread with the service account JSON in the first of `env_vars` that is set."""
+    for env_var in env_vars:
+        if os.environ.get(env_var):
+            creds_dict = json.loads(os.environ[env_var])
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
+            return gspread.authorize(creds)
+    raise KeyError(f"None of {', '.join(env_vars)} is set")
+
+
+@functools.lru_cache(maxsize=None)
+def build_llm(api_key=None, model=PRO_MODEL):
+    """A Gemini LLM (Pro unless `model` says otherwise), built once per key and model.
+
+    crewai is only imported here, once there is work for it. model_router.py picks the model per task.
+    """
+    from crewai import LLM
+    return LLM(model=model, api_key=api_key or os.environ.get("GEMINI_API_KEY"))
+
+
+def open_session(*env_vars, source=None):
+    """A SheetSession over `source`, the one named by WORKFORCE_DATA_SOURCE, or live Sheets via `authorize(*env_vars)`."""
+    source = source or source_from_env() or GSheetSource(authorize(*env_vars))
+    return SheetSession(source)
+
+
+class SheetSession:
+    """One data source (see data_sources.py) that opens each spreadsheet, and reads each sheet, only once."""
+
+    def __init__(self, source):
+        self.source = source
+        self._worksheets = {}
+        self._records = {}
+        self._snapshots = {}
+
+    def worksheet(self, sheet_id):
+        if sheet_id not in self._worksheets:
+            self._worksheets[sheet_id] = self.source.worksheet(sheet_id)
+        return self._worksheets[sheet_id]
+
+    def records(self, sheet_id, head=1):
+        """`get_all_records(head=head)` for the sheet, fetched on first use."""
+        key = (sheet_id, head)
+        if key not in self._records:
+            self._records[key] = self.worksheet(sheet_id).get_all_records(head=head)
+        return self._records[key]
+
+    @property
+    def source_kind(self):
+        """Names the data source in local state (snapshots, checkpoints, preflight), so replays never mix with live runs."""
+        return getattr(self.source, "kind", "other")
+
+    def snapshot(self, sheet_id, header_row=1, schema=None):
+        """The local snapshot of the sheet, synced with the live sheet on first use. `schema` maps columns to dtypes."""
+        key = (sheet_id, header_row)
+        if key not in self._snapshots:
+            snapshot = SheetSnapshot.for_sheet(sheet_id, source_kind=self.source_kind,
+                                               header_row=header_row, schema=schema)
+            synced = snapshot.sync(self.worksheet(sheet_id))
+            print(f"🔄 Synced {synced} new rows ({snapshot.row_count()} rows in the local snapshot).")
+            self._snapshots[key] = snapshot
+        return self._snapshots[key]
@@ -1,72 +1,142 @@
 import os
-import json
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from crewai import Agent, Task, Crew, Process, LLM
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-
-# Fetch Secrets
-api_key = os.environ.get("GEMINI_API_KEY")
-sender_email = os.environ.get("SENDER_EMAIL")
-sender_password = os.environ.get("SENDER_PASSWORD")
-receiver_email = os.environ.get("RECEIVER_EMAIL")
-
-# 1. Authenticate the CMO Robot
-try:
-    print("🔐 Authenticating JomPlan CMO with Google Cloud...")
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    # NOTE: Using the new CMO-specific secret here!
-    creds_dict = json.loads(os.environ.get("CMO_GOOGLE_CREDENTIALS_JSON"))
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-except Exception as e:
-    print(f"❌ Authentication Failed: {e}")
-    exit(1)
-
-# 2. Fetch Both Datasets Securely
-try:
-    print("📥 Downloading secure data for CMO...")
-    
-    # --- A. JOMPLAN USER DATA ---
-    jomplan_sheet_id = "1WctigP3KR7NB7rGQJ3RtZNAJCcvWeeYsBLd52Osfirg" 
-    jp_sheet = client.open_by_key(jomplan_sheet_id).sheet1
-    jp_data = jp_sheet.get_all_records(head=2)
-    df_users = pd.DataFrame(jp_data)
-    df_users.columns = df_users.columns.str.strip()
-    df_users['Timestamp'] = pd.to_datetime(df_users['Timestamp'], dayfirst=True, errors='coerce')
-    recent_users = df_users[df_users['Timestamp'] >= (pd.Timestamp.now() - pd.Timedelta(days=7))].to_dict(orient='records')
-    
-    # --- B. MARKETING TRACKER DATA ---
-    marketing_sheet_id = "1RNbPf4BLNmwq3p2lBYu7EaOTeK5VDGLECm-9GRWBy1E"
-    mkt_sheet = client.open_by_key(marketing_sheet_id).sheet1
-    mkt_data = mkt_sheet.get_all_records(head=1) 
-    df_tracker = pd.DataFrame(mkt_data)
-    tracker_data = df_tracker.tail(20).to_dict(orient='records')
-    
-except Exception as e:
-    print(f"❌ Failed to read secure data: {e}")
-    exit(1)
-
-# 3. Configure the Brain
-pro_llm = LLM(model="gemini/gemini-3.1-pro-preview", api_key=api_key)
-
-# 4. Define Workforce
-cmo = Agent(
-    role="Chief Marketing Officer & Beginner Marketing Coach",
-    goal="Guide a founder from zero marketing experience to a fully operational social media engine, adapting based on their progress in the tracker.",
-    backstory="""You are the CMO of Jom-Plan, but you specialize in teaching non-marketers. Your job is twofold:
+from clients import open_session
+from sheet_snapshot import FEEDBACK_SCHEMA
+from model_router import ModelRouter
+import model_router
+from sheet_writer import SheetWriteBuffer
+from mailer import send_html_email
+from response_cache import summary as cache_summary
+import instrumentation
+from preflight import fingerprint, unchanged, remember
+
+JOMPLAN_SHEET_ID = "1WctigP3KR7NB7rGQJ3RtZNAJCcvWeeYsBLd52Osfirg"
+MARKETING_SHEET_ID = "1RNbPf4BLNmwq3p2lBYu7EaOTeK5VDGLECm-9GRWBy1E"
+JOB = "cmo"
+
+# Tracker rows the CMO injected that the human has not touched yet
+PLACEHOLDER_STATUS = "Pending"
+PLACEHOLDER_NOTES = "Waiting on human..."
+
+# How the export step lists the tracker rows when STRUCTURED_OUTPUT=off
+EXPORT_LINES = """Output exactly 3 lines of text formatted exactly like this so the database can read it:
+    [EXPORT] | Platform Name | Short 1-sentence description of the task"""
+
+
+def export_tasks_from_lines(raw):
+    """The hidden [EXPORT] lines in the CMO's output as an ExportPlan (raises ValidationError if there are none)."""
+    from structured_output import ExportPlan, ExportTask
+
+    tasks = []
+    # Read the AI's output line by line to find the hidden [EXPORT] tags
+    for line in raw.split('\n'):
+        if '[EXPORT]' in line:
+            parts = line.split('|')
+            if len(parts) >= 3 and parts[1].strip() and parts[2].strip():
+                tasks.append(ExportTask(platform=parts[1].strip(), description=parts[2].strip()))
+    return ExportPlan(tasks=tasks)
+
+
+def export_rows(plan, today):
+    """Tracker rows for a validated ExportPlan."""
+    # Format: [Date Assigned, Platform, Task Description, Status, Human Notes]
+    return [[today, task.platform.strip(), task.description.strip(), PLACEHOLDER_STATUS, PLACEHOLDER_NOTES]
+            for task in plan.tasks]
+
+
+def extract_export_plan(email_html, llm, router):
+    """One crew that lists the tasks the sync email assigns; an ExportPlan, or None if it would not validate."""
+    from crewai import Agent, Task, Crew, Process
+    import structured_output
+    from structured_output import ExportPlan
+
+    assistant = Agent(
+        role="Marketing Operations Assistant",
+        goal="Keep the Marketing Tracker in step with the CMO's sync emails.",
+        backstory="You copy the tasks the CMO assigns into the tracker, one row per task, exactly as they were assigned.",
+        llm=llm
+    )
+    fields = ("For each task, give the platform name and a short 1-sentence description of the task.\n    "
+              + structured_output.instructions(ExportPlan))
+    export_task = Task(
+        description=f"""Here is the sync email the CMO just sent to the founder:\n{email_html}\n
+    List the 3 tasks it assigns under 'The Next 3 Steps'.
+    {fields if structured_output.ENABLED else EXPORT_LINES}""",
+        expected_output="The 3 assigned tasks, each with its platform and a 1-sentence description.",
+        agent=assistant
+    )
+    instrumentation.kickoff(JOB, Crew(agents=[assistant], tasks=[export_task], process=Process.sequential))
+    return structured_output.parse(JOB, export_task.output, ExportPlan, router.llm("reformat"), export_tasks_from_lines)
+
+
+def run(session=None, llm=None, mailer=None, source=None):
+    """Twice-weekly CMO sync. `workforce.py` passes in shared clients; standalone runs build their own.
+
+    `source` reads the sheets from somewhere other than live Google Sheets (see data_sources.py).
+    """
+    # Fetch Secrets
+    api_key = os.environ.get("GEMINI_API_KEY")
+    receiver_email = os.environ.get("RECEIVER_EMAIL")
+
+    # 1. Authenticate the CMO Robot (unless the runner already did)
+    if session is None:
+        try:
+            print("🔐 Authenticating JomPlan CMO with Google Cloud...")
+            # NOTE: Using the new CMO-specific secret here!
+            with instrumentation.stage(JOB, "auth"):
+                session = open_session("CMO_GOOGLE_CREDENTIALS_JSON", source=source)
+        except Exception as e:
+            print(f"❌ Authentication Failed: {e}")
+            raise
+
+    # 2. Fetch Both Datasets Securely
+    try:
+        print("📥 Downloading secure data for CMO...")
+
+        with instrumentation.stage(JOB, "sheet_fetch"):
+            # --- A. JOMPLAN USER DATA (shared snapshot, synced incrementally) ---
+            jp_snapshot = session.snapshot(JOMPLAN_SHEET_ID, header_row=2, schema=FEEDBACK_SCHEMA)
+            recent_users = jp_snapshot.since(pd.Timestamp.now() - pd.Timedelta(days=7)).to_dict(orient='records')
+
+            # --- B. MARKETING TRACKER DATA ---
+            mkt_sheet = session.worksheet(MARKETING_SHEET_ID)
+            mkt_data = session.records(MARKETING_SHEET_ID, head=1)
+            df_tracker = pd.DataFrame(mkt_data)
+            tracker_data = df_tracker.tail(20).to_dict(orient='records')
+
+    except Exception as e:
+        print(f"❌ Failed to read secure data: {e}")
+        raise
+
+    # Pre-flight: skip the sync when no users arrived and the human has not touched the tracker
+    # since the last email (the CMO's own untouched rows do not count as progress)
+    human_progress = [row for row in mkt_data
+                      if (row.get('Status'), row.get('Human Notes')) != (PLACEHOLDER_STATUS, PLACEHOLDER_NOTES)]
+    inputs_digest = fingerprint(human_progress, jp_snapshot.row_count())
+    if unchanged("cmo_guide", inputs_digest, session.source_kind):
+        print("🛑 No new users or tracker updates since the last sync. Exiting to save resources (set FORCE_RUN=1 to send anyway).")
+        return
+
+    # 3. Configure the Brain (crewai is only loaded once the data is in hand)
+    from crewai import Agent, Task, Crew, Process
+    import structured_output
+    # The sync email is written on the pro tier; copying its tasks into the tracker is a flash job
+    router = ModelRouter(JOB, api_key, llm=llm)
+
+    # 4. Define Workforce
+    cmo = Agent(
+        role="Chief Marketing Officer & Beginner Marketing Coach",
+        goal="Guide a founder from zero marketing experience to a fully operational social media engine, adapting based on their progress in the tracker.",
+        backstory="""You are the CMO of Jom-Plan, but you specialize in teaching non-marketers. Your job is twofold:
     1. Accountability Coach: Read the Marketing Tracker. You must assess the human's stage. If they are just starting, you act as a 101 guide, teaching them the absolute basics of setting up pages step-by-step.
     2. Strategist: Once the tracker shows their foundational setup is 'Done', you shift to data-driven content strategy, analyzing user trends to suggest specific posts.
     Always explain the 'why' and the 'how' in simple, transferable terms without jargon.""",
-    llm=pro_llm
-)
+        llm=router.llm("cmo_sync")
+    )
 
-# 5. Define Tasks
-marketing_task = Task(
-    description=f"""Review the Human's recent marketing progress:\n{tracker_data}\n
+    # 5. Define Tasks
+    marketing_task = Task(
+        description=f"""Review the Human's recent marketing progress:\n{tracker_data}\n
     Review the recent Jom-Plan user trends:\n{recent_users}\n
     
     Write a twice-a-week sync email to the human founder.
@@ -79,57 +149,41 @@ marketing_task = Task(
     4. Section 2: <h2>🎯 The Next 3 Steps</h2>.
        - IF PHASE 1 (Foundations): Ignore user trends. Assign 3 basic setup tasks. Break down the exact step-by-step instructions on *how* to do it, and explain *why* it matters.
        - IF PHASE 2 (Content Execution): Analyze the user trends. Give a brief summary of the insights, then assign 3 specific social media posts (Platform, Vibe/Visual, Caption, Hashtags).
-    5. Section 3: <h2>📝 Tracker Update Reminder</h2>. Remind the human to update the status when done.
-    6. HIDDEN DATA EXPORT: At the very bottom of your output, you MUST add exactly 3 lines of text formatted exactly like this so the database can read it:
-    [EXPORT] | Platform Name | Short 1-sentence description of the task""",
-    expected_output="An HTML email containing an accountability review, setup/content tasks, and exactly three [EXPORT] lines at the bottom.",
-    agent=cmo
-)
-
-# 6. Run the Crew
-jom_plan_crew = Crew(agents=[cmo], tasks=[marketing_task], process=Process.sequential)
-result = jom_plan_crew.kickoff()
-
-# 6. Run the Crew
-jom_plan_crew = Crew(agents=[cmo], tasks=[marketing_task], process=Process.sequential)
-result = jom_plan_crew.kickoff()
-
-# --- THE AUTOMATION INJECTION ---
-try:
-    print("✍️ Injecting tasks into Google Sheets...")
-    today = pd.Timestamp.now().strftime("%d-%b-%Y")
-    new_rows = []
-    
-    # Read the AI's output line by line to find the hidden [EXPORT] tags
-    for line in result.raw.split('\n'):
-        if '[EXPORT]' in line:
-            parts = line.split('|')
-            if len(parts) >= 3:
-                platform = parts[1].strip()
-                description = parts[2].strip()
-                # Format: [Date Assigned, Platform, Task Description, Status, Human Notes]
-                new_rows.append([today, platform, description, "Pending", "Waiting on human..."])
-                
-    # Push the rows to Google Sheets instantly
-    if new_rows:
-        mkt_sheet.append_rows(new_rows)
-        print(f"✅ Successfully injected {len(new_rows)} tasks into the Tracker!")
-except Exception as e:
-    print(f"⚠️ Could not inject to Google Sheets: {e}")
-# --------------------------------
-
-# 7. Send the Email
-try:
-    # 1. Convert the secret string into a list of emails
-    receiver_list = [email.strip() for email in receiver_email.split(",")]
-    
-    msg = MIMEMultipart()
-    msg['From'] = f"Jom-Plan CMO <{sender_email}>" 
-    # 2. Join the list back together with commas for the 'To' header in the email
-    msg['To'] = ", ".join(receiver_list) 
-    msg['Subject'] = "📈 Your Jom-Plan Marketing Sync & Next Steps"
+    5. Section 3: <h2>📝 Tracker Update Reminder</h2>. Remind the human to update the status when done.""",
+        expected_output="An HTML email containing an accountability review, setup/content tasks, and a tracker update reminder.",
+        agent=cmo
+    )
+
+    # 6. Run the Crew
+    jom_plan_crew = Crew(agents=[cmo], tasks=[marketing_task], process=Process.sequential)
+    result = instrumentation.kickoff(JOB, jom_plan_crew)
+    print(f"🗄️ {cache_summary()}")
+
+    # --- THE AUTOMATION INJECTION ---
+    try:
+        print("✍️ Injecting tasks into Google Sheets...")
+        today = pd.Timestamp.now().strftime("%d-%b-%Y")
+        # The email stays free-form HTML; a separate flash-tier step lists its tasks for the tracker.
+        # Those have to validate: a failed parse is reformatted, then redone on pro
+        plan = router.run("export", lambda export_llm: extract_export_plan(result.raw, export_llm, router))
+        new_rows = export_rows(plan, today) if plan else []
+
+        # Push the rows to Google Sheets in one batched write
+        if new_rows:
+            with instrumentation.stage(JOB, "sheet_write", rows=len(new_rows)):
+                with SheetWriteBuffer(mkt_sheet) as tracker_writes:
+                    tracker_writes.append_rows(new_rows)
+            print(f"✅ Successfully injected {len(new_rows)} tasks into the Tracker!")
+    except Exception as e:
+        print(f"⚠️ Could not inject to Google Sheets: {e}")
+    # --------------------------------
+
+    # 7. Send the Email
+    try:
+        # 1. Convert the secret string into a list of emails
+        receiver_list = [email.strip() for email in receiver_email.split(",")]
 
-    body = f"""
+        body = f"""
     <html>
       <body style="font-family: Arial, sans-serif; color: #333; max-width: 800px; margin: auto;">
         <h1 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 10px;">CMO Strategy Sync</h1>
@@ -137,15 +191,20 @@ try:
       </body>
     </html>
     """
-    msg.attach(MIMEText(body, 'html'))
-
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.starttls()
-    server.login(sender_email, sender_password) 
-    # 3. Tell the server to send the message to EVERYONE in the receiver_list
-    server.sendmail(sender_email, receiver_list, msg.as_string()) 
-    server.quit()
-    print(f"✅ CMO Sync Email sent successfully to: {receiver_list}")
-except Exception as e:
-    print(f"❌ Failed to send email: {e}")
-    
+
+        # 2. Send the message to EVERYONE in the receiver_list over one session
+        with instrumentation.stage(JOB, "email") as delivery:
+            delivery["retries"] = send_html_email("📈 Your Jom-Plan Marketing Sync & Next Steps", body, receiver_list, "Jom-Plan CMO", mailer)
+        print(f"✅ CMO Sync Email sent successfully to: {receiver_list}")
+        remember("cmo_guide", inputs_digest, session.source_kind)
+    except Exception as e:
+        print(f"❌ Failed to send email: {e}")
+
+    print(f"🧾 {structured_output.summary(JOB)}")
+    instrumentation.record(JOB, "parse", 0.0, **structured_output.totals(JOB))
+    print(f"🎚️ {model_router.summary(JOB)}")
+    print(f"📏 {instrumentation.summary(JOB)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,246 @@
+import io
+import os
+import re
+import csv
+import functools
+import urllib.request
+from collections import Counter
+import pandas as pd
+from gspread.utils import numericise_all
+from rate_limiter import call, is_rate_limited
+
+# Pick where the scripts read their sheets from (default: live Google Sheets):
+#   WORKFORCE_DATA_SOURCE=csv-export        public CSV export of each sheet (read-only)
+#   WORKFORCE_DATA_SOURCE=local:fixtures/   <sheet id>.csv or .parquet files in that folder
+DATA_SOURCE_ENV = "WORKFORCE_DATA_SOURCE"
+CSV_EXPORT_URL = "https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=0"
+
+
+class GSheetSource:
+    """Live Google Sheets through an authorized gspread client, within the shared Sheets quotas."""
+
+    # Names this source's local snapshots, so a replay never writes into a live one
+    kind = "gsheets"
+
+    def __init__(self, client):
+        self.client = client
+
+    def worksheet(self, sheet_id):
+        return RateLimitedWorksheet(call("sheets_read", lambda: self.client.open_by_key(sheet_id).sheet1))
+
+
+class RateLimitedWorksheet:
+    """A gspread Worksheet whose requests wait for the shared Sheets read/write budgets (see rate_limiter.py).
+
+    Reads are retried on any transient error. Writes are only retried on rate-limit
+    replies, which Sheets sends before applying anything, so a retry never doubles a write.
+    """
+
+    READS = {"row_values", "col_values", "get_values", "get_all_values", "get_all_records", "cell", "get"}
+    WRITES = {"update_cell", "update", "batch_update", "append_row", "append_rows"}
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def __getattr__(self, name):
+        attribute = getattr(self._worksheet, name)
+        if name in self.READS:
+            return functools.partial(call, "sheets_read", attribute)
+        if name in self.WRITES:
+            return functools.partial(call, "sheets_write", attribute, retry_if=is_rate_limited)
+        return attribute
+
+
+class MemorySource:
+    """Sheets held in memory as lists of rows, e.g. `MemorySource({sheet_id: [[header...], [row...]]})`."""
+
+    kind = "memory"
+
+    def __init__(self, sheets=None):
+        self.sheets = {sheet_id: MemoryWorksheet(rows) for sheet_id, rows in (sheets or {}).items()}
+
+    def worksheet(self, sheet_id):
+        if sheet_id not in self.sheets:
+            raise KeyError(f"No in-memory sheet with id {sheet_id}")
+        return self.sheets[sheet_id]
+
+
+class CsvExportSource(MemorySource):
+    """Reads each sheet once from its public CSV export link. Writes are refused."""
+
+    kind = "csv-export"
+
+    def __init__(self, url_template=CSV_EXPORT_URL):
+        super().__init__()
+        self.url_template = url_template
+
+    def worksheet(self, sheet_id):
+        if sheet_id not in self.sheets:
+            rows = read_grid(self.url_template.format(sheet_id=sheet_id))
+            self.sheets[sheet_id] = MemoryWorksheet(rows, read_only=True)
+        return self.sheets[sheet_id]
+
+
+class LocalFileSource(MemorySource):
+    """Reads `<sheet id>.csv` or `<sheet id>.parquet` from a folder; writes stay in memory.
+
+    CSV files are the sheet grid as exported (every row, including any above the
+    header). Parquet files hold one table, so `header_rows` says which sheet row
+    its column names belong on for sheets whose header is not in row 1.
+    """
+
+    kind = "local"
+
+    def __init__(self, folder, header_rows=None):
+        super().__init__()
+        self.folder = folder
+        self.header_rows = header_rows or {}
+
+    def worksheet(self, sheet_id):
+        if sheet_id not in self.sheets:
+            csv_path = os.path.join(self.folder, f"{sheet_id}.csv")
+            parquet_path = os.path.join(self.folder, f"{sheet_id}.parquet")
+            if os.path.exists(csv_path):
+                rows = read_grid(csv_path)
+            elif os.path.exists(parquet_path):
+                df = pd.read_parquet(parquet_path)
+                padding = [[] for _ in range(self.header_rows.get(sheet_id, 1) - 1)]
+                rows = padding + [list(df.columns)] + _sheet_cells(df)
+            else:
+                raise FileNotFoundError(f"No {sheet_id}.csv or {sheet_id}.parquet in {self.folder}")
+            self.sheets[sheet_id] = MemoryWorksheet(rows)
+        return self.sheets[sheet_id]
+
+
+class MemoryWorksheet:
+    """Stand-in for a gspread Worksheet covering the calls the workforce makes.
+
+    Cells are stored as strings, like the values Sheets hands back. `calls`
+    counts requests by method so runs can be compared without the network.
+    """
+
+    def __init__(self, rows, read_only=False):
+        self.rows = [[str(value) for value in row] for row in rows]
+        self.read_only = read_only
+        self.calls = Counter()
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def row_values(self, row):
+        self.calls["row_values"] += 1
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+        return _trim(values)
+
+    def col_values(self, col):
+        self.calls["col_values"] += 1
+        return _trim([row[col - 1] if len(row) >= col else "" for row in self.rows])
+
+    def get_values(self, range_name=None):
+        self.calls["get_values"] += 1
+        if range_name is None:
+            selected = self.rows
+        else:
+            first_row, first_col, last_row, last_col = _parse_range(range_name)
+            selected = [row[first_col - 1:last_col] for row in self.rows[first_row - 1:last_row]]
+        # Like gspread, pad short rows so the result is rectangular
+        width = max((len(row) for row in selected), default=0)
+        return [row + [""] * (width - len(row)) for row in selected]
+
+    def get_all_records(self, head=1):
+        self.calls["get_all_records"] += 1
+        header = self.rows[head - 1] if head <= len(self.rows) else []
+        return [
+            dict(zip(header, numericise_all(row + [""] * (len(header) - len(row)))))
+            for row in self.rows[head:]
+        ]
+
+    def update_cell(self, row, col, value):
+        self.calls["update_cell"] += 1
+        self._set(row, col, value)
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls["batch_update"] += 1
+        for update in data:
+            first_row, first_col, _, _ = _parse_range(update["range"])
+            for row_offset, values in enumerate(update["values"]):
+                for col_offset, value in enumerate(values):
+                    self._set(first_row + row_offset, first_col + col_offset, value)
+
+    def append_rows(self, values, value_input_option=None):
+        self.calls["append_rows"] += 1
+        self._check_writable()
+        self.rows.extend([str(value) for value in row] for row in values)
+
+    def _set(self, row, col, value):
+        self._check_writable()
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError("This sheet was loaded from a read-only CSV export")
+
+
+def read_grid(path_or_url):
+    """Every row of a CSV as strings, with the header left in place like the sheet has it."""
+    if re.match(r"https?://", path_or_url):
+        with urllib.request.urlopen(path_or_url, timeout=60) as response:
+            text = response.read().decode("utf-8")
+    else:
+        with open(path_or_url, newline="", encoding="utf-8") as f:
+            text = f.read()
+    return list(csv.reader(io.StringIO(text)))
+
+
+def source_from_env():
+    """The data source named by WORKFORCE_DATA_SOURCE, or None for live Google Sheets."""
+    spec = os.environ.get(DATA_SOURCE_ENV, "").strip()
+    if spec in ("", "gsheets"):
+        return None
+    if spec == "csv-export":
+        return CsvExportSource()
+    if spec.startswith("local:"):
+        return LocalFileSource(spec[len("local:"):])
+    raise ValueError(f"Unknown {DATA_SOURCE_ENV}={spec!r}; use gsheets, csv-export or local:<folder>")
+
+
+def _sheet_cells(df):
+    """A frame's values as the strings Sheets would hand back: blanks for missing cells, '5' rather than '5.0'."""
+    cells = df.astype(object).where(df.notna(), "")
+    for column in df.columns:
+        # Integer columns with a gap are stored as float, so whole numbers lose their '.0' here
+        if pd.api.types.is_float_dtype(df[column]):
+            cells[column] = [str(int(value)) if value != "" and value.is_integer() else value for value in cells[column]]
+    return cells.astype(str).values.tolist()
+
+
+def _trim(values):
+    # Sheets drops trailing empty cells from a row or column
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def _parse_range(range_name):
+    """'C2:G2' -> (2, 3, 2, 7). Open ends such as 'A5:G' run to the end of the sheet."""
+    bounds = []
+    for part in range_name.split("!")[-1].split(":"):
+        letters, digits = re.fullmatch(r"([A-Z]*)(\d*)", part.upper()).groups()
+        bounds.append((int(digits) if digits else None, _column_number(letters) if letters else None))
+    (first_row, first_col), (last_row, last_col) = bounds[0], bounds[-1]
+    if len(bounds) == 1:
+        last_row, last_col = first_row, first_col
+    return first_row or 1, first_col or 1, last_row, last_col
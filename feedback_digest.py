@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from kv_cache import KeyValueCache
+from prompt_compaction import estimate_tokens, SHARD_TOKEN_BUDGET
+from paths import CACHE_DIR
+
+# Map-reduce analysis for feedback too big for one prompt: every shard of rows is
+# summarized on its own, in parallel, and the summaries stand in for the raw rows.
+#   ANALYSIS_MODE=auto         map-reduce only when the rows would not fit (default)
+#   ANALYSIS_MODE=map-reduce   always
+#   ANALYSIS_MODE=direct       never (paste the rows as before)
+MODE = os.environ.get("ANALYSIS_MODE", "auto").lower()
+MAP_WORKERS = int(os.environ.get("MAP_WORKERS", "4"))
+# Above this size the shard summaries are merged again, a level at a time
+REDUCE_TOKEN_BUDGET = int(os.environ.get("REDUCE_TOKEN_BUDGET", "6000"))
+# main.py pastes the whole sheet as text until it grows past this
+DIRECT_TOKEN_BUDGET = int(os.environ.get("DIRECT_TOKEN_BUDGET", "30000"))
+
+# Shard summaries never expire: a shard's text only changes if its rows do
+CACHE_PATH = os.path.join(CACHE_DIR, "shard_summaries.sqlite")
+MAX_ENTRIES = int(os.environ.get("SHARD_CACHE_MAX_ENTRIES", "20000"))
+
+SHARD_PROMPT = """Categorize this slice of Jom-Plan user feedback:\n{text}\n
+List the bugs, complaints, feature requests, praise and locations it mentions. For each category give how many rows mention it and one short representative quote. Plain text, under 200 words."""
+
+MERGE_PROMPT = """Merge these summaries of consecutive slices of Jom-Plan user feedback into one categorized summary:\n{text}\n
+Combine matching categories and add up their counts, keep the most telling quotes, and keep categories that only appear in one slice. Plain text, under 300 words."""
+
+stats = {"shards": 0, "cached": 0}
+
+_store = KeyValueCache(CACHE_PATH, max_entries=MAX_ENTRIES)
+
+
+def needed(size, limit):
+    """Whether input of `size` (tokens, rows...) against a `limit` should be map-reduced rather than pasted."""
+    return MODE == "map-reduce" or (MODE == "auto" and size > limit)
+
+
+def summarize(shards, llm, kickoff=None):
+    """Map-reduce over `shards` (texts, e.g. from `shard_feedback()`); returns the text to prompt with.
+
+    Each shard is summarized by a one-task crew run through `kickoff(crew)`
+    (default: `response_cache.cached_kickoff`). Summaries already in the shard
+    cache are reused, so a growing sheet only pays for its newest shard.
+    """
+    summaries = _map(shards, SHARD_PROMPT, llm, kickoff)
+    shard_count = len(summaries)
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > REDUCE_TOKEN_BUDGET:
+        summaries = _map(_group(summaries), MERGE_PROMPT, llm, kickoff)
+    parts = [f"Part {i} of {len(summaries)}:\n{summary}" for i, summary in enumerate(summaries, 1)]
+    return "\n\n".join([f"(Summarized from {shard_count} slices of rows)"] + parts)
+
+
+def summary():
+    return f"{stats['cached']}/{stats['shards']} feedback shards summarized from cache"
+
+
+def _map(texts, prompt, llm, kickoff):
+    # Shards are read (and hashed) in this thread as they stream in; only uncached ones go to the pool
+    model = getattr(llm, "model", str(llm))
+    results = []
+    with ThreadPoolExecutor(max_workers=MAP_WORKERS) as pool:
+        for text in texts:
+            key = hashlib.sha256(json.dumps([model, prompt, text]).encode()).hexdigest()
+            cached = _store.get(key)
+            stats["shards"] += 1
+            if cached is not None:
+                stats["cached"] += 1
+                results.append(cached)
+            else:
+                results.append(pool.submit(_summarize_one, key, prompt.format(text=text), llm, kickoff))
+    return [result if isinstance(result, str) else result.result() for result in results]
+
+
+def _group(summaries):
+    # Consecutive summaries packed up to one shard's worth of tokens, at least two per group so each level shrinks
+    groups, current, used = [], [], 0
+    for summary in summaries:
+        cost = estimate_tokens(summary)
+        if len(current) >= 2 and used + cost > SHARD_TOKEN_BUDGET:
+            groups.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(summary)
+        used += cost
+    if len(current) == 1 and groups:
+        groups[-1] += "\n\n" + current[0]
+    elif current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+def _summarize_one(key, description, llm, kickoff):
+    from crewai import Agent, Task, Crew
+    if kickoff is None:
+        from response_cache import cached_kickoff as kickoff
+
+    analyst = Agent(
+        role="Feedback Analyst",
+        goal="Condense a slice of user feedback into counted categories without losing any recurring issue.",
+        backstory="You read raw Jom-Plan user feedback and report what users complain about, ask for, and praise, with counts.",
+        llm=llm
+    )
+    task = Task(
+        description=description,
+        expected_output="A plain-text list of feedback categories, each with a count and a representative quote.",
+        agent=analyst
+    )
+    result = kickoff(Crew(agents=[analyst], tasks=[task])).raw
+    _store.put(key, result)
+    return result
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+
+# One JSON object per line for every stage of every job in this process.
+# The workflows upload the metrics/ folder as an artifact after each run.
+METRICS_PATH = os.environ.get("WORKFORCE_METRICS_PATH", os.path.join("metrics", "metrics.jsonl"))
+RUN_ID = os.environ.get("GITHUB_RUN_ID") or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+
+# Estimated USD per million (prompt, completion) tokens, matched against the model name.
+# Override for every model with LLM_PRICE_PER_MILLION="prompt,completion".
+PRICES_PER_MILLION = {
+    "gemini-3.1-pro": (2.00, 12.00),
+    "gemini-3-pro": (2.00, 12.00),
+    "gemini-3-flash": (0.50, 3.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+# Runs of one crew before a rate-limit or transient error is raised (each rerun repeats its LLM calls)
+KICKOFF_ATTEMPTS = int(os.environ.get("KICKOFF_ATTEMPTS", "3"))
+
+_lock = threading.Lock()
+_records = []
+_tasks = {}  # task id -> job, for the crews passed to kickoff()
+_usage = {}  # task id -> token counts and timestamps collected from crewai events
+_events_registered = False
+
+
+def record(job, stage, seconds, **fields):
+    """Appends one stage measurement to the metrics file and returns it."""
+    entry = {"run": RUN_ID, "job": job, "stage": stage, "seconds": round(seconds, 3), **fields}
+    with _lock:
+        _records.append(entry)
+        os.makedirs(os.path.dirname(METRICS_PATH) or ".", exist_ok=True)
+        with open(METRICS_PATH, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+    return entry
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MB (None where `resource` is unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+@contextlib.contextmanager
+def stage(job, name, **fields):
+    """Times the `with` block as one stage. Add counts (rows, retries...) to the yielded dict."""
+    extra = dict(fields)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield extra
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        record(job, name, time.perf_counter() - started, status=status, peak_rss_mb=peak_rss_mb(), **extra)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD for the tokens, or None when the model has no known price."""
+    override = os.environ.get("LLM_PRICE_PER_MILLION")
+    if override:
+        prices = tuple(float(price) for price in override.split(","))
+    else:
+        matches = [key for key in PRICES_PER_MILLION if key in str(model)]
+        if not matches:
+            return None
+        prices = PRICES_PER_MILLION[max(matches, key=len)]
+    return round((prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000, 6)
+
+
+def kickoff(job, crew, attempts=KICKOFF_ATTEMPTS):
+    """`cached_kickoff(crew)` with retries, recording one 'task' stage per task and a 'crew' stage with the totals.
+
+    Pass `attempts=1` when the caller already retries the whole unit of work (see rate_limiter.RetryScheduler).
+    """
+    from crewai.events import crewai_event_bus
+    from response_cache import cached_kickoff
+    from rate_limiter import call, install_llm_rate_limit
+    from model_router import tier_of
+
+    _register_event_handlers()
+    # Every LLM call waits for the shared Gemini budget; a crew that still hits a rate limit is rerun after a backoff
+    install_llm_rate_limit("gemini")
+    task_ids = [str(task.id) for task in crew.tasks]
+    with _lock:
+        for task_id in task_ids:
+            _tasks[task_id] = job
+
+    model = getattr(crew.tasks[0].agent.llm, "model", "")
+    started = time.perf_counter()
+    try:
+        result = call("gemini", cached_kickoff, crew, acquire=False, max_attempts=attempts)
+    finally:
+        seconds = time.perf_counter() - started
+        # crewai runs event handlers on a thread pool; wait for them before reading the counts
+        crewai_event_bus.flush()
+        for task, task_id in zip(crew.tasks, task_ids):
+            task_model = getattr(task.agent.llm, "model", "")
+            with _lock:
+                _tasks.pop(task_id, None)
+                usage = _usage.pop(task_id, None)
+            if usage is None:
+                # No LLM call and no task events: the answer came from the response cache
+                record(job, "task", 0.0, agent=task.agent.role, cached=True, tier=tier_of(task_model),
+                       prompt_tokens=0, completion_tokens=0, llm_calls=0, retries=0, cost_usd=0.0)
+                continue
+            task_seconds = (usage["finished"] - usage["started"]) if usage["finished"] and usage["started"] else 0.0
+            record(job, "task", task_seconds, agent=task.agent.role, cached=False, tier=tier_of(task_model),
+                   model=usage["model"] or task_model,
+                   prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"],
+                   llm_calls=usage["llm_calls"], retries=usage["failed_calls"],
+                   cost_usd=estimate_cost(usage["model"] or task_model, usage["prompt_tokens"], usage["completion_tokens"]))
+
+    token_usage = getattr(result, "token_usage", None)
+    prompt_tokens = getattr(token_usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(token_usage, "completion_tokens", 0) or 0
+    record(job, "crew", seconds, model=model, tasks=len(task_ids),
+           prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+           cost_usd=estimate_cost(model, prompt_tokens, completion_tokens))
+    return result
+
+
+def summary(job):
+    """One line of LLM totals (tokens, estimated cost) and retries for a job."""
+    with _lock:
+        records = [r for r in _records if r["job"] == job]
+    crews = [r for r in records if r["stage"] == "crew"]
+    tokens = sum(r["prompt_tokens"] + r["completion_tokens"] for r in crews)
+    cost = sum(r["cost_usd"] or 0 for r in crews)
+    retries = sum(r.get("retries", 0) for r in records)
+    return f"{len(crews)} crew runs, {tokens:,} LLM tokens (~${cost:.4f}), {retries} retries -> {METRICS_PATH}"
+
+
+def by_tier(job):
+    """Task count, seconds and estimated USD per model tier (see model_router.py) for a job's LLM tasks."""
+    with _lock:
+        tasks = [r for r in _records if r["job"] == job and r["stage"] == "task" and not r["cached"]]
+    tiers = {}
+    for r in tasks:
+        totals = tiers.setdefault(r["tier"] or "other", {"tasks": 0, "seconds": 0.0, "cost_usd": 0.0})
+        totals["tasks"] += 1
+        totals["seconds"] += r["seconds"]
+        totals["cost_usd"] += r["cost_usd"] or 0
+    return tiers
+
+
+def _register_event_handlers():
+    global _events_registered
+    with _lock:
+        if _events_registered:
+            return
+        _events_registered = True
+
+    from crewai.events import crewai_event_bus, TaskStartedEvent, TaskCompletedEvent, LLMCallCompletedEvent, LLMCallFailedEvent
+
+    def usage_for(task_id):
+        # Called with _lock held; only tasks started through kickoff() are tracked
+        if task_id not in _tasks:
+            return None
+        return _usage.setdefault(task_id, {
+            "started": None, "finished": None, "model": None,
+            "prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0, "failed_calls": 0,
+        })
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def task_started(source, event):
+        with _lock:
+            usage = usage_for(event.task_id)
+            if usage is not None:
+                usage["started"] = event.timestamp.timestamp()
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def task_completed(source, event):
+        with _lock:
+            usage = usage_for(event.task_id)
+            if usage is not None:
+                usage["finished"] = event.timestamp.timestamp()
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def llm_call_completed(source, event):
+        tokens = event.usage or {}
+        with _lock:
+            usage = usage_for(event.task_id)
+            if usage is not None:
+                usage["model"] = event.model
+                usage["llm_calls"] += 1
+                usage["prompt_tokens"] += tokens.get("prompt_tokens", tokens.get("prompt_token_count", 0)) or 0
+                usage["completion_tokens"] += tokens.get("completion_tokens", 0) or 0
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def llm_call_failed(source, event):
+        with _lock:
+            usage = usage_for(event.task_id)
+            if usage is not None:
+                usage["failed_calls"] += 1
@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class KeyValueCache:
+    """JSON-able values by key in one SQLite file, shared by every thread in the process.
+
+    Entries older than `ttl_seconds` are dropped (None keeps them forever), and
+    past `max_entries` the least recently used ones go first. The file is only
+    opened on first use; its timeout lets two processes sharing it wait for
+    each other's writes.
+    """
+
+    def __init__(self, path, ttl_seconds=None, max_entries=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = None
+
+    def get(self, key):
+        """The value saved under `key`, or None when there is none or it has expired."""
+        with self._lock:
+            db = self._connect()
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            with db:
+                if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            db = self._connect()
+            now = time.time()
+            with db:
+                db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now))
+                # Expired entries go first, then the least recently used ones past max_entries
+                if self.ttl_seconds is not None:
+                    db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+                if self.max_entries is not None:
+                    db.execute(
+                        "DELETE FROM entries WHERE key IN "
+                        "(SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    )
+
+    def _connect(self):
+        # Called with _lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)""")
+        return self._db
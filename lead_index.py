@@ -0,0 +1,87 @@
+import re
+import unicodedata
+
+# Legal-form and filler words that do not tell two companies apart
+NAME_NOISE = {
+    "sdn", "bhd", "berhad", "pte", "ltd", "limited", "plc", "llc", "inc", "co", "corp", "company",
+    "enterprise", "enterprises", "group", "the", "and", "&",
+}
+# Sites many businesses share a domain on, so the domain alone says nothing about the company
+SHARED_DOMAINS = {
+    "facebook.com", "instagram.com", "linkedin.com", "google.com", "goo.gl", "tripadvisor.com",
+    "booking.com", "agoda.com", "wa.me", "linktr.ee", "tiktok.com", "x.com", "twitter.com",
+}
+DOMAIN_PATTERN = re.compile(r"(?:https?://)?((?:[a-z0-9-]+\.)+[a-z]{2,})", re.IGNORECASE)
+# Host prefixes for the same site ('m.facebook.com' is facebook.com)
+HOST_PREFIXES = ("www.", "m.", "web.", "mobile.")
+
+
+def normalize_name(name):
+    """'The Jom Hotel Sdn. Bhd.' -> 'jom hotel'."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().lower()
+    words = re.sub(r"[^a-z0-9&]+", " ", text).split()
+    return " ".join(word for word in words if word not in NAME_NOISE)
+
+
+def domain_of(text):
+    """The first website domain mentioned in `text` ('https://www.jom.my/about - ...' -> 'jom.my'), or None.
+
+    None as well for shared sites and any of their subdomains ('sites.google.com', 'maps.app.goo.gl').
+    """
+    match = DOMAIN_PATTERN.search(str(text))
+    if not match:
+        return None
+    domain = match.group(1).lower()
+    while domain.startswith(HOST_PREFIXES) and domain.count(".") > 1:
+        domain = domain.split(".", 1)[1]
+    if any(domain == shared or domain.endswith("." + shared) for shared in SHARED_DOMAINS):
+        return None
+    return domain
+
+
+class LeadIndex:
+    """Every company already in the CRM, by normalized name and by website domain.
+
+    Built once per run from the CRM records. `new_leads()` drops prospect rows
+    that match a known company and indexes the ones it keeps, so two prospecting
+    rows in the same run cannot add the same business twice either.
+    """
+
+    def __init__(self, records=()):
+        self.names = set()
+        self.domains = set()
+        self.checked = 0
+        self.duplicates = 0
+        for row in records:
+            name = row.get('Lead Name / Niche', row.get('Lead Name or Niche', ''))
+            self.add(name, row.get('Website or Location/Context', ''))
+
+    def add(self, name, context):
+        name, domain = normalize_name(name), domain_of(context)
+        if name:
+            self.names.add(name)
+        if domain:
+            self.domains.add(domain)
+
+    def known(self, name, context):
+        domain = domain_of(context)
+        return normalize_name(name) in self.names or (domain is not None and domain in self.domains)
+
+    def new_leads(self, rows):
+        """The CRM rows ([company, context, ...]) whose company is not in the index yet."""
+        fresh = []
+        for row in rows:
+            self.checked += 1
+            if self.known(row[0], row[1]):
+                self.duplicates += 1
+                continue
+            self.add(row[0], row[1])
+            fresh.append(row)
+        return fresh
+
+    @property
+    def duplicate_rate(self):
+        return self.duplicates / self.checked if self.checked else 0.0
+
+    def summary(self):
+        return f"{self.duplicates}/{self.checked} prospects were already in the CRM ({self.duplicate_rate:.0%} duplicate rate)"
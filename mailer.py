@@ -0,0 +1,127 @@
+import os
+import time
+import smtplib
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# Point these at a local stand-in (e.g. `python -m aiosmtpd -n -l localhost:8025`
+# with SMTP_STARTTLS=off) to try the workers without sending real mail.
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "on").lower() != "off"
+MAX_ATTEMPTS = int(os.environ.get("SMTP_MAX_ATTEMPTS", "4"))
+BACKOFF_SECONDS = float(os.environ.get("SMTP_BACKOFF_SECONDS", "2"))
+
+
+def is_transient(error):
+    """True for failures worth retrying: dropped connections, timeouts and 4xx replies."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Every other SMTPException (refused recipients, unsupported commands...) is permanent;
+    # they subclass OSError, so they have to be ruled out before the network errors below
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class Mailer:
+    """Sends queued HTML emails over one reused SMTP session.
+
+    Messages are queued with `send_html` and delivered by `flush` (or when the
+    `with` block ends). Transient errors drop the connection and retry with
+    exponential backoff; other errors fail only the affected message.
+    """
+
+    def __init__(self, sender_email, sender_password, host=SMTP_HOST, port=SMTP_PORT, starttls=SMTP_STARTTLS):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.sent = 0
+        self.retries = 0
+        self._server = None
+        self._queue = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def send_html(self, subject, html, recipients, from_name):
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        msg = MIMEMultipart()
+        msg['From'] = f"{from_name} <{self.sender_email}>"
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html, 'html'))
+        self._queue.append((recipients, msg))
+
+    def flush(self):
+        """Delivers every queued message, then raises the first failure (if any)."""
+        first_error = None
+        while self._queue:
+            recipients, msg = self._queue.pop(0)
+            try:
+                self._deliver(recipients, msg)
+                self.sent += 1
+            except Exception as e:
+                first_error = first_error or e
+        if first_error is not None:
+            raise first_error
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _connect(self):
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.starttls:
+                server.starttls()
+            if self.sender_password:
+                server.login(self.sender_email, self.sender_password)
+            self._server = server
+        return self._server
+
+    def _deliver(self, recipients, msg):
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                self._connect().sendmail(self.sender_email, recipients, msg.as_string())
+                return
+            except Exception as e:
+                # A broken session is never reused; the next attempt reconnects
+                self.close()
+                if not is_transient(e) or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                self.retries += 1
+                delay = BACKOFF_SECONDS * 2 ** attempt
+                print(f"⏳ Email delivery hit a temporary error ({e}); retrying in {delay:g}s...")
+                time.sleep(delay)
+
+
+def send_html_email(subject, html, recipients, from_name, mailer=None):
+    """Sends one message now, through `mailer` when given (its session stays open) or a one-off session.
+
+    Returns how many delivery retries it took.
+    """
+    if mailer is None:
+        with Mailer(os.environ.get("SENDER_EMAIL"), os.environ.get("SENDER_PASSWORD")) as one_off:
+            one_off.send_html(subject, html, recipients, from_name)
+        return one_off.retries
+    retries_before = mailer.retries
+    mailer.send_html(subject, html, recipients, from_name)
+    mailer.flush()
+    return mailer.retries - retries_before
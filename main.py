@@ -1,7 +1,19 @@
 import streamlit as st
 import pandas as pd
-from crewai import Agent, Task, Crew, Process, LLM
 import os
+import time
+import queue
+import hashlib
+import threading
+from response_cache import cached_kickoff, summary as cache_summary
+from data_sources import CsvExportSource, source_from_env
+from prompt_compaction import estimate_tokens, shard_feedback
+import feedback_digest
+
+# How long a downloaded copy of the sheet is reused before fetching it again
+SHEET_TTL_SECONDS = int(os.environ.get("SHEET_TTL_SECONDS", "300"))
+# How many reports (one per distinct sheet version) are kept in memory
+MAX_CACHED_REPORTS = 5
 
 # --- Streamlit UI Setup ---
 st.set_page_config(page_title="Jom-Plan AI Workforce", page_icon="🇲🇾", layout="centered")
@@ -10,78 +22,192 @@ st.markdown("This dashboard connects directly to the Jom-Plan Google Sheet datab
 
 # Secure API Key Input
 api_key = st.text_input("Enter your Gemini API Key:", type="password")
+stream_report = st.toggle("Stream the report as it is written", value=True)
 
-# Your specific Google Sheet URL (formatted for Pandas to read as a CSV)
-google_sheet_url = "https://docs.google.com/spreadsheets/d/1WctigP3KR7NB7rGQJ3RtZNAJCcvWeeYsBLd52Osfirg/export?format=csv&gid=0"
+# Your specific Google Sheet, read through its public CSV export
+# (set WORKFORCE_DATA_SOURCE=local:<folder> to read a local copy instead)
+JOMPLAN_SHEET_ID = "1WctigP3KR7NB7rGQJ3RtZNAJCcvWeeYsBLd52Osfirg"
 
 st.markdown("---")
 
+
+# --- Cached Building Blocks (shared by every session in this process) ---
+@st.cache_data(ttl=SHEET_TTL_SECONDS, show_spinner=False)
+def load_feedback(sheet_id):
+    """Downloads the sheet and returns (text for the AI, shards to map-reduce or None, hash of that text)."""
+    source = source_from_env() or CsvExportSource()
+    rows = source.worksheet(sheet_id).get_values()
+    df = pd.DataFrame(rows[1:], columns=rows[0])
+    # Convert the spreadsheet into a text format the AI can read easily
+    feedback_data = df.to_string(index=False)
+    # Too big for one prompt: split it into token-sized shards to summarize first
+    shards = None
+    if feedback_digest.needed(estimate_tokens(feedback_data), feedback_digest.DIRECT_TOKEN_BUDGET):
+        shards = list(shard_feedback(df))
+    return feedback_data, shards, hashlib.sha256(feedback_data.encode()).hexdigest()
+
+
+@st.cache_resource(show_spinner=False)
+def build_workforce(api_key, stream):
+    # crewai is only loaded once someone asks for a report, so the page itself renders fast
+    from crewai import Agent, LLM
+    from model_router import model_for
+
+    # Configure the Brain (Using the powerful Gemini 3.1 Pro model, the "pro" tier in model_router.py)
+    pro_llm = LLM(model=model_for("engineering"), api_key=api_key, stream=stream)
+
+    engineer = Agent(
+        role="Lead Systems Engineer",
+        goal="Analyze raw user feedback data, identify the most critical systemic issues, and propose Replit-compatible technical roadmaps.",
+        # NEW REPLIT-AWARE BACKSTORY:
+        backstory="You are a senior technical architect for Jom-Plan. Crucially, you know that the entire Jom-Plan application is built, hosted, and deployed natively on Replit using Python. When you propose technical fixes, you must provide solutions, code snippets, and terminal commands that are specifically designed to be executed within the Replit cloud IDE environment.",
+        llm=pro_llm,
+        verbose=True
+    )
+
+    ceo = Agent(
+        role="Chief Executive Officer",
+        goal="Translate technical realities into strategic shareholder recommendations.",
+        # NEW REPLIT-AWARE BACKSTORY:
+        backstory="You are the visionary CEO of Jom-Plan. You know the tech stack is hosted on Replit, which allows for rapid, agile deployment. You take technical reports from your engineer and decide which fixes make the most business sense to present to the board of directors.",
+        llm=pro_llm,
+        verbose=True
+    )
+    return engineer, ceo
+
+
+@st.cache_resource
+def report_store():
+    """Finished reports keyed by sheet hash, plus a lock so only one crew runs at a time."""
+    return {"reports": {}, "lock": threading.Lock()}
+
+
+@st.cache_resource
+def live_feed():
+    """Forwards streamed LLM tokens to the queue of the report currently being generated."""
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+    feed = {"queue": None}
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def forward_chunk(source, event):
+        if feed["queue"] is not None:
+            feed["queue"].put(("chunk", event.chunk))
+
+    return feed
+
+
 # --- The Execution Block ---
 if st.button("Generate Consolidated Report"):
     if not api_key:
         st.warning("Please enter your Gemini API Key first.")
     else:
-        with st.spinner("The C-Suite is securely downloading and analyzing the Jom-Plan Database..."):
+        started = time.monotonic()
+        with st.spinner("The C-Suite is securely downloading the Jom-Plan Database..."):
             
             # 1. Fetch the data directly from your Google Sheet
             try:
-                df = pd.read_csv(google_sheet_url)
-                # Convert the spreadsheet into a text format the AI can read easily
-                feedback_data = df.to_string(index=False)
+                feedback_data, shards, data_hash = load_feedback(JOMPLAN_SHEET_ID)
             except Exception as e:
                 st.error("❌ Could not read the Google Sheet. Please ensure the Share settings are set to 'Anyone with the link can view'.")
                 st.stop()
-            
-            # 2. Configure the Brain (Using the powerful Gemini 3.1 Pro model)
-            os.environ["GEMINI_API_KEY"] = api_key
-            pro_llm = LLM(model="gemini/gemini-3.1-pro-preview", api_key=api_key)
-
-            # 3. Define the Workforce
-            engineer = Agent(
-                role="Lead Systems Engineer",
-                goal="Analyze raw user feedback data, identify the most critical systemic issues, and propose Replit-compatible technical roadmaps.",
-                # NEW REPLIT-AWARE BACKSTORY:
-                backstory="You are a senior technical architect for Jom-Plan. Crucially, you know that the entire Jom-Plan application is built, hosted, and deployed natively on Replit using Python. When you propose technical fixes, you must provide solutions, code snippets, and terminal commands that are specifically designed to be executed within the Replit cloud IDE environment.",
-                llm=pro_llm,
-                verbose=True
-            )
-
-            ceo = Agent(
-                role="Chief Executive Officer",
-                goal="Translate technical realities into strategic shareholder recommendations.",
-                # NEW REPLIT-AWARE BACKSTORY:
-                backstory="You are the visionary CEO of Jom-Plan. You know the tech stack is hosted on Replit, which allows for rapid, agile deployment. You take technical reports from your engineer and decide which fixes make the most business sense to present to the board of directors.",
-                llm=pro_llm,
-                verbose=True
-            )
-
-            # 4. Define the Consolidated Tasks
-            engineering_task = Task(
-                description=f"Analyze the following live dataset of Jom-Plan user feedback:\n\n{feedback_data}\n\nYour task:\n1. Categorize the feedback to find the top systemic issues or feature requests.\n2. Provide a step-by-step technical execution plan for the most critical issue.\n3. Write a 'Consolidated Technical Review' summarizing the overall health of the app based on this data.",
-                expected_output="A structured Consolidated Technical Review with categorized bugs and proposed technical solutions.",
-                agent=engineer
-            )
-
-            ceo_task = Task(
-                description="Read the Engineer's Consolidated Technical Review. Draft a formal memorandum to the Jom-Plan Shareholders. In this memo, summarize the app's current technical health based on the data, and officially recommend which of the engineer's fixes we should prioritize investing in for the next development sprint. Justify your choices with business and user-retention logic.",
-                expected_output="A formal, professional Shareholder Memorandum recommending specific technical fixes.",
-                agent=ceo
-            )
-
-            # 5. Run the Crew
-            jom_plan_crew = Crew(
-                agents=[engineer, ceo], 
-                tasks=[engineering_task, ceo_task], 
-                process=Process.sequential # Engineer runs first, hands output to CEO
-            )
-            
-            result = jom_plan_crew.kickoff()
-            
-            # 6. Display the Results
-            st.success("✅ Analysis Complete!")
-            st.markdown("### 📊 CEO's Shareholder Memorandum")
-            st.write(result.raw)
-            
-            with st.expander("View the Engineer's Raw Technical Data"):
-                st.write(engineering_task.output.raw)
 
+        # 2. Reuse the last report unless the sheet has changed since it was written.
+        # The lock also keeps two viewers from driving the shared agents at once.
+        store = report_store()
+        with store["lock"]:
+            report = store["reports"].get(data_hash)
+            if report is None:
+                # 3. Configure the Brain and the Workforce
+                os.environ["GEMINI_API_KEY"] = api_key
+                engineer, ceo = build_workforce(api_key, stream_report)
+
+                if shards:
+                    # Map-reduce: summarize the shards in parallel (unchanged ones come from the shard cache),
+                    # on the cheaper model tier the digest is configured for
+                    from model_router import ModelRouter
+                    digest_llm = ModelRouter("dashboard", api_key).llm("feedback_digest")
+                    with st.spinner(f"The C-Suite is summarizing {len(shards)} slices of feedback..."):
+                        feedback_data = feedback_digest.summarize(shards, digest_llm, kickoff=cached_kickoff)
+                    st.caption(f"🧩 {feedback_digest.summary()}")
+
+                # 4. Define the Consolidated Tasks
+                from crewai import Task, Crew, Process
+
+                engineering_task = Task(
+                    description=f"Analyze the following live dataset of Jom-Plan user feedback:\n\n{feedback_data}\n\nYour task:\n1. Categorize the feedback to find the top systemic issues or feature requests.\n2. Provide a step-by-step technical execution plan for the most critical issue.\n3. Write a 'Consolidated Technical Review' summarizing the overall health of the app based on this data.",
+                    expected_output="A structured Consolidated Technical Review with categorized bugs and proposed technical solutions.",
+                    agent=engineer
+                )
+
+                ceo_task = Task(
+                    description="Read the Engineer's Consolidated Technical Review. Draft a formal memorandum to the Jom-Plan Shareholders. In this memo, summarize the app's current technical health based on the data, and officially recommend which of the engineer's fixes we should prioritize investing in for the next development sprint. Justify your choices with business and user-retention logic.",
+                    expected_output="A formal, professional Shareholder Memorandum recommending specific technical fixes.",
+                    agent=ceo
+                )
+
+                # 5. Run the Crew in the background and show its progress as it arrives
+                events = queue.Queue()
+                jom_plan_crew = Crew(
+                    agents=[engineer, ceo], 
+                    tasks=[engineering_task, ceo_task], 
+                    process=Process.sequential, # Engineer runs first, hands output to CEO
+                    task_callback=lambda output: events.put(("task", output))
+                )
+
+                def run_crew():
+                    try:
+                        events.put(("done", cached_kickoff(jom_plan_crew)))
+                    except Exception as e:
+                        events.put(("error", e))
+
+                feed = live_feed()
+                feed["queue"] = events
+                threading.Thread(target=run_crew, daemon=True).start()
+
+                first_content_at = None
+                with st.status("🧠 The Engineer is reviewing the feedback...", expanded=True) as status:
+                    live_draft = st.empty()
+                    draft = ""
+                    while True:
+                        kind, payload = events.get()
+                        if first_content_at is None and kind in ("chunk", "task"):
+                            first_content_at = time.monotonic() - started
+                        if kind == "chunk":
+                            draft += payload
+                            live_draft.markdown(draft)
+                        elif kind == "task" and payload.agent == engineer.role:
+                            # The Engineer is done: show the review while the CEO writes
+                            live_draft.empty()
+                            draft = ""
+                            st.markdown("#### 🛠️ Engineer's Technical Review")
+                            st.write(payload.raw)
+                            live_draft = st.empty()
+                            status.update(label="👔 The CEO is drafting the shareholder memorandum...")
+                        elif kind == "done":
+                            break
+                        elif kind == "error":
+                            feed["queue"] = None
+                            status.update(label="❌ The C-Suite hit an error.", state="error")
+                            st.error(f"❌ {payload}")
+                            st.stop()
+                    feed["queue"] = None
+                    status.update(label="✅ Report written", state="complete", expanded=False)
+
+                if first_content_at is not None:
+                    st.caption(f"⏱️ First content after {first_content_at:.1f}s")
+
+                report = {"memo": payload.raw, "engineering": engineering_task.output.raw}
+
+                store["reports"][data_hash] = report
+                while len(store["reports"]) > MAX_CACHED_REPORTS:
+                    store["reports"].pop(next(iter(store["reports"])))
+        
+        # 6. Display the Results
+        st.success("✅ Analysis Complete!")
+        st.caption(f"🗄️ {cache_summary()}")
+        st.markdown("### 📊 CEO's Shareholder Memorandum")
+        st.write(report["memo"])
+        
+        with st.expander("View the Engineer's Raw Technical Data"):
+            st.write(report["engineering"])
@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import Counter
+from clients import build_llm, PRO_MODEL
+import instrumentation
+
+# The model behind each tier. "flash" is fast and cheap, for mechanical and high-volume steps;
+# "pro" is kept for the analysis and writing a human actually reads.
+MODELS = {
+    "flash": os.environ.get("FLASH_MODEL", "gemini/gemini-3-flash-preview"),
+    "pro": os.environ.get("PRO_MODEL", PRO_MODEL),
+}
+
+# The tier each task starts on. Override any of them with e.g. MODEL_TIERS="prospect=pro,cmo_sync=flash".
+# A flash answer that fails validation or reports low confidence is redone once on pro.
+TASK_TIERS = {
+    "prospect": "flash",         # sales_crews.py: five businesses for a niche
+    "outreach": "flash",         # sales_crews.py: decision maker and cold email per CRM row
+    "reformat": "flash",         # structured_output.py: re-asks for the formatting only
+    "export": "flash",           # cmo_guide.py: tracker rows from the finished sync email
+    "feedback_digest": "flash",  # feedback_digest.py: per-shard feedback summaries
+    "cmo_sync": "pro",
+    "engineering": "pro",
+    "ceo": "pro",
+}
+TASK_TIERS.update(dict(pair.split("=", 1) for pair in os.environ.get("MODEL_TIERS", "").replace(" ", "").split(",") if "=" in pair))
+
+_lock = threading.Lock()
+_escalations = {}  # job -> Counter of task names redone on pro
+
+
+def tier_for(task):
+    return TASK_TIERS.get(task, "pro")
+
+
+def model_for(task):
+    return MODELS[tier_for(task)]
+
+
+def tier_of(model):
+    """The tier a model name belongs to, or None for a model outside MODELS (a test stub, say)."""
+    for tier, name in MODELS.items():
+        if str(model) and str(model).split("/")[-1] == name.split("/")[-1]:
+            return tier
+    return None
+
+
+def rejection(answer):
+    """Why a validated answer (or None, when it did not validate) should be redone on pro; None to keep it."""
+    if answer is None:
+        return "invalid"
+    if getattr(answer, "confidence", "high") == "low":
+        return "low_confidence"
+    return None
+
+
+class ModelRouter:
+    """Hands each task the LLM for its tier and escalates rejected flash answers to pro.
+
+    An injected `llm` (shared clients, offline runs) pins every tier to that one
+    model, so nothing is escalated.
+    """
+
+    def __init__(self, job, api_key=None, llm=None):
+        self.job = job
+        self.api_key = api_key
+        self.pinned = llm
+
+    def llm(self, task, tier=None):
+        if self.pinned is not None:
+            return self.pinned
+        return build_llm(self.api_key, MODELS[tier or tier_for(task)])
+
+    def run(self, task, attempt, answer=lambda result: result):
+        """`attempt(llm)` on the task's tier, redone once on pro when the flash answer is rejected.
+
+        `answer` picks the validated answer (or None) out of what `attempt` returns.
+        """
+        result = attempt(self.llm(task))
+        if self.pinned is not None or tier_for(task) == "pro":
+            return result
+        reason = rejection(answer(result))
+        if reason is None:
+            return result
+        print(f"⬆️ {task} answer was {reason.replace('_', ' ')} on flash; escalating to pro...")
+        with _lock:
+            _escalations.setdefault(self.job, Counter())[task] += 1
+        instrumentation.record(self.job, "escalation", 0.0, task=task, reason=reason)
+        return attempt(self.llm(task, "pro"))
+
+
+def summary(job):
+    """Latency and estimated cost per tier for a job's LLM tasks, plus how many were escalated."""
+    tiers = instrumentation.by_tier(job)
+    parts = [f"{tier}: {t['tasks']} tasks, {t['seconds']:.1f}s, ~${t['cost_usd']:.4f}" for tier, t in sorted(tiers.items())]
+    with _lock:
+        escalated = sum(_escalations.get(job, Counter()).values())
+    return f"{'; '.join(parts) or 'no LLM tasks'} ({escalated} escalated to pro)"
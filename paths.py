@@ -0,0 +1,6 @@
+import os
+
+# Local state that outlives a run: sheet snapshots, LLM/search/shard caches, checkpoint
+# journals and preflight fingerprints. The workflows persist this folder between runs
+# with actions/cache (failed runs included). Point WORKFORCE_CACHE_DIR elsewhere for replays.
+CACHE_DIR = os.environ.get("WORKFORCE_CACHE_DIR", ".cache")
@@ -0,0 +1,40 @@
+import os
+import json
+import hashlib
+from paths import CACHE_DIR
+
+# Fingerprints of the inputs each job last acted on, one file per kind of data source
+STATE_PATH = os.path.join(CACHE_DIR, "preflight_{source_kind}.json")
+
+# Set FORCE_RUN=1 to run a job even when its inputs have not changed
+FORCE_RUN = os.environ.get("FORCE_RUN", "").lower() in ("1", "true", "yes", "on")
+
+
+def fingerprint(*inputs):
+    """Content hash of JSON-able inputs (anything else, e.g. timestamps, is hashed by its str())."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def unchanged(job, digest, source_kind="gsheets"):
+    """True when `job` already ran on exactly these inputs from this kind of source and FORCE_RUN is not set."""
+    return not FORCE_RUN and _load(source_kind).get(job) == digest
+
+
+def remember(job, digest, source_kind="gsheets"):
+    """Records that `job` finished successfully on these inputs."""
+    state = _load(source_kind)
+    state[job] = digest
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = STATE_PATH.format(source_kind=source_kind)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _load(source_kind):
+    try:
+        with open(STATE_PATH.format(source_kind=source_kind)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
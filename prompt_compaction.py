@@ -0,0 +1,154 @@
+import os
+import pandas as pd
+
+# Token budgets for the feedback blocks pasted into prompts
+RECENT_TOKEN_BUDGET = int(os.environ.get("RECENT_TOKEN_BUDGET", "6000"))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "4000"))
+# Size of each shard of rows summarized on its own in map-reduce mode (feedback_digest.py)
+SHARD_TOKEN_BUDGET = int(os.environ.get("SHARD_TOKEN_BUDGET", "3000"))
+
+# Share of a budget kept back for the summary of rows that do not fit verbatim
+SUMMARY_SHARE = 0.25
+TOP_VALUES = 5
+MAX_CELL_CHARS = 300
+
+_encoding = None
+
+
+def _get_encoding():
+    # tiktoken loads its BPE tables on first use rather than at import time
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def estimate_tokens(text):
+    """Token count of `text` (cl100k when tiktoken is available, ~4 chars per token otherwise)."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def compact_feedback(df, token_budget, timestamp_column="Timestamp"):
+    """Renders feedback rows as a pipe-separated table that fits in `token_budget`.
+
+    Empty columns are dropped and rows that repeat everything but the timestamp
+    are merged into one row with a 'Repeats' count. If the table is still too
+    long, the newest rows are kept verbatim and the older ones are folded into
+    a short per-column summary.
+    """
+    if df.empty:
+        return "(no rows)"
+
+    df = _drop_empty_columns(df)
+    df = _dedupe(df, timestamp_column)
+
+    table = _render_table(df)
+    if estimate_tokens(table) <= token_budget:
+        return table
+
+    # Fill the budget with the newest rows first, then summarize whatever is left
+    header, *lines = table.split("\n")
+    row_budget = token_budget * (1 - SUMMARY_SHARE) - estimate_tokens(header)
+    kept = []
+    for line in reversed(lines):
+        cost = estimate_tokens(line) + 1
+        if cost > row_budget:
+            break
+        kept.append(line)
+        row_budget -= cost
+    kept.reverse()
+
+    older = df.iloc[: len(lines) - len(kept)]
+    summary = _summarize(older, timestamp_column)
+    return "\n".join([summary, "", f"Latest {len(kept)} rows verbatim:", header] + kept)
+
+
+def shard_feedback(frames, token_budget=SHARD_TOKEN_BUDGET):
+    """Yields feedback rows as consecutive pipe-separated tables of at most `token_budget` tokens.
+
+    `frames` is a DataFrame or an iterable of them (e.g. `SheetSnapshot.before()`).
+    A shard's text depends only on its own rows and where it starts only on the
+    rows before it, so appending rows to the sheet leaves every earlier shard
+    byte-for-byte the same. Only the last shard changes as the sheet grows.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    header = None
+    lines, used = [], 0
+    for df in frames:
+        if header is None:
+            header = " | ".join(str(col) for col in df.columns)
+            room = token_budget - estimate_tokens(header)
+        for row in df.itertuples(index=False, name=None):
+            line = " | ".join(_cell(value) for value in row)
+            cost = estimate_tokens(line) + 1
+            if lines and used + cost > room:
+                yield "\n".join([header] + lines)
+                lines, used = [], 0
+            lines.append(line)
+            used += cost
+    if lines:
+        yield "\n".join([header] + lines)
+
+
+def _drop_empty_columns(df):
+    blank = df.replace("", pd.NA).isna().all()
+    return df.loc[:, ~blank]
+
+
+def _dedupe(df, timestamp_column):
+    content_columns = [col for col in df.columns if col != timestamp_column]
+    if not content_columns:
+        return df
+    keys = df[content_columns].astype(str)
+    repeats = keys.groupby(content_columns, sort=False)[content_columns[0]].transform("size")
+    deduped = df.loc[~keys.duplicated(keep="last")]
+    if (repeats > 1).any():
+        deduped = deduped.assign(Repeats=repeats.loc[deduped.index])
+    return deduped
+
+
+def _cell(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    text = " ".join(str(value).split()).replace("|", "/")
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS] + "…"
+
+
+def _render_table(df):
+    lines = [" | ".join(str(col) for col in df.columns)]
+    for row in df.itertuples(index=False, name=None):
+        lines.append(" | ".join(_cell(value) for value in row))
+    return "\n".join(lines)
+
+
+def _summarize(df, timestamp_column):
+    lines = [f"Summary of {len(df)} older rows"]
+    if timestamp_column in df.columns and df[timestamp_column].notna().any():
+        lines[0] += f" ({_cell(df[timestamp_column].min())} to {_cell(df[timestamp_column].max())})"
+    lines[0] += ":"
+
+    for col in df.columns:
+        if col in (timestamp_column, "Repeats"):
+            continue
+        values = df[col].map(_cell)
+        values = values[values != ""]
+        if values.empty:
+            continue
+        counts = values.value_counts()
+        if counts.iloc[0] > 1:
+            top = ", ".join(f"{value[:60]} ({count})" for value, count in counts.head(TOP_VALUES).items())
+            lines.append(f"- {col}: {counts.size} distinct; most common: {top}")
+        else:
+            samples = "; ".join(value[:80] for value in values.tail(3))
+            lines.append(f"- {col}: {counts.size} distinct free-text entries, e.g. {samples}")
+    return "\n".join(lines)
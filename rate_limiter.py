@@ -0,0 +1,256 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Requests-per-minute ceilings for each upstream, shared by every worker thread.
+# Override per provider with an env var, e.g. GEMINI_RPM=60, SERPER_RPM=120 or SHEETS_WRITE_RPM=30.
+# Google Sheets allows 60 reads and 60 writes a minute per user.
+DEFAULT_RPM = {
+    "gemini": 30,
+    "serper": 60,
+    "sheets_read": 60,
+    "sheets_write": 60,
+}
+
+# Attempts at one call before its error is raised
+MAX_ATTEMPTS = int(os.environ.get("RATE_LIMIT_MAX_ATTEMPTS", "5"))
+BACKOFF_SECONDS = float(os.environ.get("RATE_LIMIT_BACKOFF_SECONDS", "2"))
+MAX_BACKOFF_SECONDS = 60.0
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "ratelimit", "resource_exhausted", "quota", "too many requests")
+TRANSIENT_STATUS_CODES = {500, 502, 503, 504}
+
+stats = {}  # provider -> {"calls", "rate_limited", "retries"}
+
+
+class RateLimiter:
+    """Token bucket that lets at most `per_minute` calls start in any minute, with bursts of up to `burst`.
+
+    The rate adapts to the upstream: `throttle()` (after a rate-limit reply) halves
+    it and pauses every caller for the backoff, and each `succeeded()` call wins
+    back a little of the ceiling.
+    """
+
+    def __init__(self, per_minute, burst=1):
+        self.ceiling = per_minute / 60.0 if per_minute else 0.0
+        self.rate = self.ceiling
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.ceiling:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttle(self, pause_seconds):
+        """The upstream said slow down: halve the rate and hold every caller for `pause_seconds`."""
+        if not self.ceiling:
+            return
+        with self._lock:
+            self.rate = max(self.rate / 2, self.ceiling / 16)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+
+    def succeeded(self):
+        # Additive increase back towards the configured ceiling
+        with self._lock:
+            self.rate = min(self.ceiling, self.rate + self.ceiling / 20)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(provider):
+    """Returns the process-wide limiter for a provider, creating it on first use."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm = float(os.environ.get(f"{provider.upper()}_RPM", DEFAULT_RPM.get(provider, 0)))
+            # Short bursts (a tenth of the minute's budget) are fine; the per-minute quota is what counts
+            _limiters[provider] = RateLimiter(rpm, burst=max(1, int(rpm // 10)))
+            stats[provider] = {"calls": 0, "rate_limited": 0, "retries": 0}
+        return _limiters[provider]
+
+
+def status_code(error):
+    """The HTTP status behind an error from requests, gspread, litellm or google-genai, if it has one."""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_rate_limited(error):
+    """True for 429s and quota errors, however the client library wraps them."""
+    if status_code(error) == 429 or "ratelimit" in type(error).__name__.lower():
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def is_retryable(error):
+    """Rate limits, 5xx replies, timeouts and dropped connections."""
+    if is_rate_limited(error):
+        return True
+    if status_code(error) in TRANSIENT_STATUS_CODES:
+        return True
+    name = type(error).__name__.lower()
+    return isinstance(error, (TimeoutError, ConnectionError)) or "timeout" in name or "connectionerror" in name
+
+
+def backoff_seconds(error, attempt):
+    """Retry-After when the reply carries one, otherwise exponential backoff with jitter."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(float(headers.get("Retry-After")), MAX_BACKOFF_SECONDS)
+    except (TypeError, ValueError):
+        return min(BACKOFF_SECONDS * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+
+def call(provider, fn, *args, retry_if=is_retryable, max_attempts=MAX_ATTEMPTS, acquire=True, **kwargs):
+    """`fn(*args, **kwargs)` inside the provider's budget, retried with backoff while `retry_if(error)` holds.
+
+    Rate-limit errors also throttle the provider's limiter, so every other caller slows down too.
+    Pass `acquire=False` when `fn` already spends the budget itself (e.g. a crew whose LLM calls do).
+    """
+    limiter = limiter_for(provider)
+    for attempt in range(1, max_attempts + 1):
+        if acquire:
+            limiter.acquire()
+            with _limiters_lock:
+                stats[provider]["calls"] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts or not retry_if(e):
+                raise
+            wait = backoff_seconds(e, attempt)
+            _note_failure(provider, e, wait)
+            print(f"⏳ {provider} call failed ({type(e).__name__}); retry {attempt}/{max_attempts - 1} in {wait:.1f}s")
+            time.sleep(wait)
+        else:
+            limiter.succeeded()
+            return result
+
+
+def summary():
+    parts = [f"{provider}: {s['calls']} calls, {s['rate_limited']} rate-limited, {s['retries']} retried"
+             for provider, s in sorted(stats.items()) if s["calls"] or s["retries"]]
+    return "; ".join(parts) or "no upstream calls"
+
+
+def _note_failure(provider, error, wait, retried=True):
+    limiter_for(provider)
+    with _limiters_lock:
+        stats[provider]["retries"] += retried
+        if is_rate_limited(error):
+            stats[provider]["rate_limited"] += 1
+    if is_rate_limited(error):
+        limiter_for(provider).throttle(wait)
+
+
+class RetryScheduler:
+    """Thread pool for units of work that requeues a unit when it fails with a retryable error.
+
+    `submit()` returns a Future for the unit's final outcome. A failed unit goes to
+    the back of the queue after a backoff, so the rest of the batch keeps going
+    while the upstream recovers. The backoff is a timer, not a sleep, so it never
+    holds a worker. Leaving the `with` block waits for every retry.
+    """
+
+    def __init__(self, max_workers, provider=None, max_attempts=3):
+        self.provider = provider
+        self.max_attempts = max_attempts
+        self.requeued = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._outcomes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for outcome in list(self._outcomes):
+            try:
+                outcome.result()
+            except Exception:
+                pass  # the caller reads the error from the Future
+        self._pool.shutdown(wait=True)
+
+    def submit(self, fn, *args, **kwargs):
+        outcome = Future()
+        self._outcomes.append(outcome)
+        self._attempt(outcome, 1, fn, args, kwargs)
+        return outcome
+
+    def _attempt(self, outcome, attempt, fn, args, kwargs):
+        def done(future):
+            error = future.exception()
+            if error is None:
+                outcome.set_result(future.result())
+            elif attempt < self.max_attempts and is_retryable(error):
+                wait = backoff_seconds(error, attempt)
+                if self.provider:
+                    _note_failure(self.provider, error, wait)
+                self.requeued += 1
+                print(f"🔁 Requeued a failed unit of work ({type(error).__name__}), attempt {attempt + 1}/{self.max_attempts}")
+                retry = threading.Timer(wait, self._attempt, (outcome, attempt + 1, fn, args, kwargs))
+                retry.daemon = True
+                retry.start()
+            else:
+                outcome.set_exception(error)
+
+        self._pool.submit(fn, *args, **kwargs).add_done_callback(done)
+
+
+_llm_hook_installed = False
+_llm_hook_lock = threading.Lock()
+
+
+def install_llm_rate_limit(provider="gemini"):
+    """Makes every crewai LLM call in this process wait for the provider's shared budget.
+
+    Rate-limited calls throttle the budget for everyone; successful ones let it recover.
+    Safe to call from every worker thread: the hook is only registered once.
+    """
+    global _llm_hook_installed
+    with _llm_hook_lock:
+        if _llm_hook_installed:
+            return
+        from crewai.hooks import register_before_llm_call_hook
+        from crewai.events import crewai_event_bus, LLMCallCompletedEvent, LLMCallFailedEvent
+
+        limiter = limiter_for(provider)
+
+        def before_call(context):
+            limiter.acquire()
+            with _limiters_lock:
+                stats[provider]["calls"] += 1
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        def llm_call_completed(source, event):
+            limiter.succeeded()
+
+        @crewai_event_bus.on(LLMCallFailedEvent)
+        def llm_call_failed(source, event):
+            if is_rate_limited(event.error):
+                _note_failure(provider, event.error, BACKOFF_SECONDS, retried=False)
+
+        register_before_llm_call_hook(before_call)
+        _llm_hook_installed = True
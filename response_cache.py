@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+import threading
+from kv_cache import KeyValueCache
+from paths import CACHE_DIR
+
+CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses.sqlite")
+
+# Set LLM_CACHE=off to always call the model
+ENABLED = os.environ.get("LLM_CACHE", "on").lower() != "off"
+TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_HOURS", "24")) * 3600
+MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+stats = {"hits": 0, "misses": 0}
+
+_lock = threading.Lock()
+_store = KeyValueCache(CACHE_PATH, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES)
+
+
+def crew_key(crew):
+    """Content hash of everything that shapes the crew's answer: model, agent persona and task text."""
+    parts = [crew.process.value if hasattr(crew.process, "value") else str(crew.process)]
+    for task in crew.tasks:
+        agent = task.agent
+        parts.append({
+            "model": getattr(agent.llm, "model", str(agent.llm)),
+            "role": agent.role,
+            "goal": agent.goal,
+            "backstory": agent.backstory,
+            "description": task.description,
+            "expected_output": task.expected_output,
+        })
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def get(key):
+    value = _store.get(key)
+    with _lock:
+        stats["hits" if value is not None else "misses"] += 1
+    return value
+
+
+def put(key, value):
+    _store.put(key, value)
+
+
+def cached_kickoff(crew):
+    """`crew.kickoff()`, but identical crews are answered from the local cache."""
+    if not ENABLED:
+        return crew.kickoff()
+
+    key = crew_key(crew)
+    cached = get(key)
+    if cached is not None:
+        print(f"♻️ Reusing cached answer for: {crew.tasks[-1].agent.role}")
+        return _restore(crew, cached)
+
+    result = crew.kickoff()
+    # Saved in crew.tasks order so _restore() can hand each output back to its task, async ones included
+    put(key, [
+        {
+            "raw": output.raw,
+            "pydantic": output.pydantic.model_dump() if output.pydantic is not None else None,
+            "json_dict": output.json_dict,
+        }
+        for output in (task.output for task in crew.tasks)
+    ])
+    return result
+
+
+def summary():
+    total = stats["hits"] + stats["misses"]
+    return f"{stats['hits']}/{total} LLM crew runs served from cache"
+
+
+def _restore(crew, cached):
+    # Rebuild real crewai outputs so callers can keep using result.raw and task.output
+    from crewai import CrewOutput, TaskOutput
+    from crewai.types.usage_metrics import UsageMetrics
+
+    tasks_output = []
+    for task, saved in zip(crew.tasks, cached):
+        pydantic = None
+        if saved["pydantic"] is not None and task.output_pydantic is not None:
+            pydantic = task.output_pydantic.model_validate(saved["pydantic"])
+        task.output = TaskOutput(
+            description=task.description,
+            expected_output=task.expected_output,
+            agent=task.agent.role,
+            raw=saved["raw"],
+            pydantic=pydantic,
+            json_dict=saved["json_dict"],
+        )
+        tasks_output.append(task.output)
+
+    last = tasks_output[-1]
+    return CrewOutput(
+        raw=last.raw,
+        pydantic=last.pydantic,
+        json_dict=last.json_dict,
+        tasks_output=tasks_output,
+        token_usage=UsageMetrics(),
+    )
@@ -0,0 +1,192 @@
+from crewai import Agent, Task, Crew, Process
+from crewai_tools import SerperDevTool
+from rate_limiter import call
+import search_cache
+import instrumentation
+import structured_output
+from structured_output import Prospect, ProspectList, OutreachDraft
+
+# The crews behind sales_ops.py, kept apart so the crewai stack is only imported
+# once the CRM actually has 'prospect' or 'new' rows to work on.
+
+# Metrics for these crews are recorded under the same job name as the rest of sales_ops.py
+JOB = "sales"
+# sales_ops.py runs each row through a RetryScheduler, which already retries the whole row,
+# so its crews are kicked off once instead of retrying again underneath it
+CREW_ATTEMPTS = 1
+
+# How each crew is told to lay out its answer: JSON for structured_output.py to validate,
+# or (STRUCTURED_OUTPUT=off) the original line formats.
+PROSPECT_LINES = """Format your exact output as 5 distinct lines, separated by a pipe (|), like this:
+        [Company Name] | [Website URL] | [1-sentence description of what they do]"""
+PROSPECT_FIELDS = f"""For each of the 5 businesses, give its company name, website URL and a 1-sentence description of what they do.
+        {structured_output.instructions(ProspectList)}"""
+OUTREACH_SECTIONS = """CRITICAL FORMATTING RULE: You MUST format your output exactly like this with the ||| separators:
+        [1 paragraph viability assessment]
+        |||
+        [Name and Role of the decision maker you found. If none found, write "General Manager / Team"]
+        |||
+        [Email address or LinkedIn profile if found. If none found, write "Not found publicly"]
+        |||
+        Subject: [Your Subject Line]
+        Hi [Name],
+        [Body of email tailored to your research]
+        Best,
+        Jom-Plan Team"""
+OUTREACH_FIELDS = f"""CRITICAL FORMATTING RULE: Fill in every field:
+        - viability: 1 paragraph viability assessment
+        - contact_name: Name and Role of the decision maker you found. If none found, write "General Manager / Team"
+        - contact_info: Email address or LinkedIn profile if found. If none found, write "Not found publicly"
+        - email: "Subject: [Your Subject Line]", then "Hi [Name],", the body of the email tailored to your research, and the sign-off "Best, Jom-Plan Team".
+        {structured_output.instructions(OutreachDraft)}"""
+
+
+class RateLimitedSerperDevTool(SerperDevTool):
+    """SerperDevTool that waits for the shared Serper budget before each search, backing off on 429s."""
+
+    def _make_api_request(self, search_query, search_type):
+        return call("serper", super()._make_api_request, search_query, search_type)
+
+
+class CachedSerperDevTool(RateLimitedSerperDevTool):
+    """Searches go through search_cache.py first; only misses spend Serper budget and quota.
+
+    Identical searches from parallel workers share one request. With
+    SEARCH_BACKEND=stub, canned results stand in for Serper entirely.
+    """
+
+    def _make_api_request(self, search_query, search_type):
+        if search_cache.BACKEND == "stub":
+            return search_cache.stub_results(search_query, search_type)
+        key = search_cache.search_key(search_query, search_type, n_results=self.n_results,
+                                      country=self.country, location=self.location, locale=self.locale)
+        return search_cache.cached_search(key, lambda: super(CachedSerperDevTool, self)._make_api_request(search_query, search_type))
+
+
+# --- The Level 2 Sales Team ---
+# Agents keep per-run state, so each worker thread builds its own copy.
+def build_prospector(llm, search_tool):
+    return Agent(
+        role="Lead Generation Specialist",
+        goal="Find actual, literal businesses that perfectly match the human's requested niche.",
+        backstory="You are a ruthless, highly literal internet researcher. You never assume or guess. If asked for 'Hotels', you find literal buildings where people sleep.",
+        tools=[search_tool],
+        llm=llm
+    )
+
+
+def build_sales_rep(llm, search_tool):
+    return Agent(
+        role="Senior B2B Sales SDR",
+        goal="Research companies, find the exact decision-maker (GM, Founder, Marketing Director), and write highly personalized cold emails to them.",
+        backstory="You are an elite SDR. You know that emailing 'info@' is a waste of time. You scour the web to find the actual name and role of the person in charge before drafting your highly targeted pitch.",
+        tools=[search_tool],
+        llm=llm
+    )
+
+
+# --- ENGINE A: THE HUNTER (Now doing 5 at a time) ---
+def prospect_leads(lead_name, context, router, search_tool):
+    """Runs the prospector crew (flash tier, pro if the answer is unusable) and returns the new CRM rows it found."""
+    print(f"🕵️‍♂️ Prospecting new leads for: {lead_name}")
+    prospects = router.run("prospect", lambda llm: find_prospects(lead_name, context, llm, router, search_tool))
+    return prospect_rows(prospects) if prospects else []
+
+
+def find_prospects(lead_name, context, llm, router, search_tool):
+    """One prospector crew on `llm`; its answer as a ProspectList, or None if it would not validate."""
+    prospector = build_prospector(llm, search_tool)
+
+    prospect_task = Task(
+        description=f"""Search the web for 5 real businesses that perfectly match this literal description: '{lead_name}'. 
+        Location/Context: '{context}'. 
+        
+        CRITICAL RULES:
+        1. BE LITERAL: You MUST return exactly the niche requested.
+        2. GEOGRAPHY: If the Location/Context is blank, default your search strictly to Malaysia.
+        
+        {PROSPECT_FIELDS if structured_output.ENABLED else PROSPECT_LINES}""",
+        expected_output="5 businesses, each with Company, URL and Description." if structured_output.ENABLED
+        else "5 lines of text, each containing Company | URL | Description.",
+        agent=prospector
+    )
+
+    crew = Crew(agents=[prospector], tasks=[prospect_task], process=Process.sequential)
+    instrumentation.kickoff(JOB, crew, attempts=CREW_ATTEMPTS)
+    return structured_output.parse(JOB, prospect_task.output, ProspectList, router.llm("reformat"), prospects_from_lines)
+
+
+def prospects_from_lines(raw):
+    """The prospector's 'Company | URL | Description' lines as a ProspectList (raises ValidationError if there are none)."""
+    prospects = []
+    for line in raw.split('\n'):
+        if '|' in line:
+            parts = line.split('|')
+            if len(parts) >= 2 and parts[0].strip() and parts[1].strip():
+                description = parts[2].strip() if len(parts) > 2 else ""
+                prospects.append(Prospect(company=parts[0].strip(), url=parts[1].strip(), description=description))
+    return ProspectList(prospects=prospects)
+
+
+def prospect_rows(prospects):
+    """New CRM rows for a validated ProspectList."""
+    new_rows = []
+    for prospect in prospects.prospects:
+        new_context = f"{prospect.url} - {prospect.description}" if prospect.description else prospect.url
+        # Append 7 columns worth of data so the sheet formatting stays clean
+        new_rows.append([prospect.company.strip(), new_context.strip(), "New", "", "", "", ""])
+    return new_rows
+
+
+# --- ENGINE B: THE SNIPER (Now hunting for specific humans) ---
+def draft_outreach(lead_name, context, router, search_tool):
+    """Runs the SDR crew (flash tier, pro if the answer is unusable) and returns the [viability, contact, info, email] cells."""
+    print(f"⚙️ Researching Decision Makers & Drafting for: {lead_name}")
+    draft, raw = router.run("outreach", lambda llm: research_lead(lead_name, context, llm, router, search_tool),
+                            answer=lambda result: result[0])
+    if draft is None:
+        # Keep whatever the SDR wrote; the row is still worth a human look
+        return parse_outreach(raw)
+    return [draft.viability.strip(), draft.contact_name.strip(), draft.contact_info.strip(), draft.email.strip()]
+
+
+def research_lead(lead_name, context, llm, router, search_tool):
+    """One SDR crew on `llm`: its answer as an OutreachDraft (None if it would not validate) and its raw text."""
+    sales_rep = build_sales_rep(llm, search_tool)
+
+    lead_task = Task(
+        description=f"""Use Google Search to deeply research this specific company: '{lead_name}' (Context/Website: {context}).
+        
+        1. VIABILITY: Would they benefit from Jom-Plan (a personalized travel itinerary app)? Why?
+        2. FIND THE HUMAN: Search the web, their "About Us" page, or LinkedIn to find the name of the General Manager, Marketing Director, or Founder.
+        3. DRAFT EMAIL: Write a professional, personalized cold email addressed directly to that specific person.
+        
+        {OUTREACH_FIELDS if structured_output.ENABLED else OUTREACH_SECTIONS}""",
+        expected_output="The viability assessment, decision maker, contact details and cold email." if structured_output.ENABLED
+        else "4 sections separated exactly by |||",
+        agent=sales_rep
+    )
+
+    crew = Crew(agents=[sales_rep], tasks=[lead_task], process=Process.sequential)
+    result = instrumentation.kickoff(JOB, crew, attempts=CREW_ATTEMPTS)
+    draft = structured_output.parse(JOB, lead_task.output, OutreachDraft, router.llm("reformat"), outreach_from_sections)
+    return draft, result.raw
+
+
+def outreach_from_sections(raw):
+    """The SDR's 4 |||-separated sections as an OutreachDraft (raises ValueError if any is missing)."""
+    output_parts = [part.strip() for part in raw.split('|||')]
+    if len(output_parts) < 4:
+        raise ValueError(f"expected 4 sections separated by |||, got {len(output_parts)}")
+    return OutreachDraft(viability=output_parts[0], contact_name=output_parts[1],
+                         contact_info=output_parts[2], email='|||'.join(output_parts[3:]))
+
+
+def parse_outreach(raw):
+    """[viability, contact name, contact info, drafted email] from the SDR's |||-separated output."""
+    output_parts = raw.split('|||')
+    viability_details = output_parts[0].strip() if len(output_parts) > 0 else "Research failed."
+    contact_name = output_parts[1].strip() if len(output_parts) > 1 else "Not found."
+    contact_info = output_parts[2].strip() if len(output_parts) > 2 else "Not found."
+    drafted_email = output_parts[3].strip() if len(output_parts) > 3 else "Draft failed."
+    return [viability_details, contact_name, contact_info, drafted_email]
@@ -1,180 +1,200 @@
 import os
-import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import SerperDevTool
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import pandas as pd
-
-# Fetch Secrets
-api_key = os.environ.get("GEMINI_API_KEY")
-serper_key = os.environ.get("SERPER_API_KEY")
-sender_email = os.environ.get("SENDER_EMAIL")
-sender_password = os.environ.get("SENDER_PASSWORD")
-receiver_email = os.environ.get("RECEIVER_EMAIL")
-
-os.environ["SERPER_API_KEY"] = serper_key
-
-# 1. Authenticate with Google Cloud
-try:
-    print("🔐 Authenticating Sales Ops with Google Cloud...")
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = json.loads(os.environ.get("SALES_GOOGLE_CREDENTIALS_JSON"))
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-except Exception as e:
-    print(f"❌ Authentication Failed: {e}")
-    exit(1)
-
-# 2. Connect to the Sales CRM
-sales_sheet_id = "1J0Xy0tBC0-Tp7o-PAQL5F5eMdaAqSjcYQzA0jR2yrus" 
-sheet = client.open_by_key(sales_sheet_id).sheet1
-records = sheet.get_all_records()
-
-pro_llm = LLM(model="gemini/gemini-3.1-pro-preview", api_key=api_key)
-search_tool = SerperDevTool()
-
-# 3. Define the Level 2 Sales Team
-prospector = Agent(
-    role="Lead Generation Specialist",
-    goal="Find actual, literal businesses that perfectly match the human's requested niche.",
-    backstory="You are a ruthless, highly literal internet researcher. You never assume or guess. If asked for 'Hotels', you find literal buildings where people sleep.",
-    tools=[search_tool],
-    llm=pro_llm
-)
-
-sales_rep = Agent(
-    role="Senior B2B Sales SDR",
-    goal="Research companies, find the exact decision-maker (GM, Founder, Marketing Director), and write highly personalized cold emails to them.",
-    backstory="You are an elite SDR. You know that emailing 'info@' is a waste of time. You scour the web to find the actual name and role of the person in charge before drafting your highly targeted pitch.",
-    tools=[search_tool],
-    llm=pro_llm
-)
-
-drafted_count = 0
-found_leads_count = 0
-
-print("🔍 Scanning CRM for Tasks...")
-
-# 4. Loop through the CRM
-for index, row in enumerate(records, start=2):
-    status = str(row.get('Status', '')).strip().lower()
-    
-    # Safely check for the column name whether you used the slash or 'or'
-    lead_name = str(row.get('Lead Name / Niche', row.get('Lead Name or Niche', ''))).strip()
-    context = str(row.get('Website or Location/Context', '')).strip()
-    
-    # --- ENGINE A: THE HUNTER (Now doing 5 at a time) ---
-    if status == 'prospect':
-        print(f"🕵️‍♂️ Prospecting new leads for: {lead_name}")
-        
-        prospect_task = Task(
-            description=f"""Search the web for 5 real businesses that perfectly match this literal description: '{lead_name}'. 
-            Location/Context: '{context}'. 
-            
-            CRITICAL RULES:
-            1. BE LITERAL: You MUST return exactly the niche requested.
-            2. GEOGRAPHY: If the Location/Context is blank, default your search strictly to Malaysia.
-            
-            Format your exact output as 5 distinct lines, separated by a pipe (|), like this:
-            [Company Name] | [Website URL] | [1-sentence description of what they do]""",
-            expected_output="5 lines of text, each containing Company | URL | Description.",
-            agent=prospector
-        )
-        
-        crew = Crew(agents=[prospector], tasks=[prospect_task], process=Process.sequential)
-        result = crew.kickoff()
-        
-        new_rows = []
-        for line in result.raw.split('\n'):
-            if '|' in line:
-                parts = line.split('|')
-                if len(parts) >= 2:
-                    new_company = parts[0].strip()
-                    new_context = parts[1].strip() + " - " + parts[2].strip() if len(parts) > 2 else parts[1].strip()
-                    # Append 7 columns worth of data so the sheet formatting stays clean
-                    new_rows.append([new_company, new_context, "New", "", "", "", ""])
-        
-        if new_rows:
-            sheet.append_rows(new_rows)
-            sheet.update_cell(index, 3, "Prospecting Complete")
-            found_leads_count += len(new_rows)
-            print(f"✅ Found {len(new_rows)} new leads for {lead_name}!")
-
-    # --- ENGINE B: THE SNIPER (Now hunting for specific humans) ---
-    elif status == 'new':
-        print(f"⚙️ Researching Decision Makers & Drafting for: {lead_name}")
-        
-        lead_task = Task(
-            description=f"""Use Google Search to deeply research this specific company: '{lead_name}' (Context/Website: {context}).
-            
-            1. VIABILITY: Would they benefit from Jom-Plan (a personalized travel itinerary app)? Why?
-            2. FIND THE HUMAN: Search the web, their "About Us" page, or LinkedIn to find the name of the General Manager, Marketing Director, or Founder.
-            3. DRAFT EMAIL: Write a professional, personalized cold email addressed directly to that specific person.
-            
-            CRITICAL FORMATTING RULE: You MUST format your output exactly like this with the ||| separators:
-            [1 paragraph viability assessment]
-            |||
-            [Name and Role of the decision maker you found. If none found, write "General Manager / Team"]
-            |||
-            [Email address or LinkedIn profile if found. If none found, write "Not found publicly"]
-            |||
-            Subject: [Your Subject Line]
-            Hi [Name],
-            [Body of email tailored to your research]
-            Best,
-            Jom-Plan Team""",
-            expected_output="4 sections separated exactly by |||",
-            agent=sales_rep
-        )
-        
-        crew = Crew(agents=[sales_rep], tasks=[lead_task], process=Process.sequential)
-        result = crew.kickoff()
-        
+import functools
+from concurrent.futures import Future
+from clients import open_session
+from model_router import ModelRouter
+import model_router
+import rate_limiter
+from rate_limiter import RetryScheduler
+from sheet_writer import SheetWriteBuffer
+from lead_index import LeadIndex
+from checkpoint import CheckpointJournal
+import search_cache
+from mailer import send_html_email
+from response_cache import summary as cache_summary
+import instrumentation
+
+SALES_SHEET_ID = "1J0Xy0tBC0-Tp7o-PAQL5F5eMdaAqSjcYQzA0jR2yrus"
+JOB = "sales"
+STATUS_COLUMN = 3
+WORK_STATUSES = ('prospect', 'new')
+
+
+def run(session=None, llm=None, mailer=None, source=None):
+    """Daily CRM prospecting and drafting. `workforce.py` passes in shared clients; standalone runs build their own.
+
+    `source` reads the sheets from somewhere other than live Google Sheets (see data_sources.py).
+    """
+    # Fetch Secrets
+    api_key = os.environ.get("GEMINI_API_KEY")
+    serper_key = os.environ.get("SERPER_API_KEY")
+    receiver_email = os.environ.get("RECEIVER_EMAIL")
+
+    # How many CRM rows are researched at the same time
+    max_workers = int(os.environ.get("SALES_MAX_WORKERS", "4"))
+
+    # The search tool reads its key from the environment; SEARCH_BACKEND=stub runs need none
+    if serper_key:
+        os.environ["SERPER_API_KEY"] = serper_key
+
+    # 1. Authenticate with Google Cloud (unless the runner already did)
+    if session is None:
         try:
-            output_parts = result.raw.split('|||')
-            viability_details = output_parts[0].strip() if len(output_parts) > 0 else "Research failed."
-            contact_name = output_parts[1].strip() if len(output_parts) > 1 else "Not found."
-            contact_info = output_parts[2].strip() if len(output_parts) > 2 else "Not found."
-            drafted_email = output_parts[3].strip() if len(output_parts) > 3 else "Draft failed."
-            
-            sheet.update_cell(index, 3, "Drafted")
-            sheet.update_cell(index, 4, viability_details)
-            sheet.update_cell(index, 5, contact_name)
-            sheet.update_cell(index, 6, contact_info)
-            sheet.update_cell(index, 7, drafted_email)
-            drafted_count += 1
-            print(f"✅ Successfully researched humans and drafted email for {lead_name}.")
+            print("🔐 Authenticating Sales Ops with Google Cloud...")
+            with instrumentation.stage(JOB, "auth"):
+                session = open_session("SALES_GOOGLE_CREDENTIALS_JSON", source=source)
+        except Exception as e:
+            print(f"❌ Authentication Failed: {e}")
+            raise
+
+    # 2. Connect to the Sales CRM and check the Status column alone before reading whole rows
+    with instrumentation.stage(JOB, "sheet_fetch") as fetch:
+        sheet = session.worksheet(SALES_SHEET_ID)
+        statuses = sheet.col_values(STATUS_COLUMN)[1:]
+        has_work = any(str(status).strip().lower() in WORK_STATUSES for status in statuses)
+        records = session.records(SALES_SHEET_ID) if has_work else []
+        fetch["rows"] = len(records)
+    if not has_work:
+        print("🛑 No 'prospect' or 'new' rows in the CRM. Exiting to save resources.")
+        return
+
+    drafted_count = 0
+    found_leads_count = 0
+
+    print("🔍 Scanning CRM for Tasks...")
+
+    # 3. Collect the work from the CRM
+    jobs = []
+    for index, row in enumerate(records, start=2):
+        status = str(row.get('Status', '')).strip().lower()
+
+        # Safely check for the column name whether you used the slash or 'or'
+        lead_name = str(row.get('Lead Name / Niche', row.get('Lead Name or Niche', ''))).strip()
+        context = str(row.get('Website or Location/Context', '')).strip()
+
+        if status in WORK_STATUSES:
+            jobs.append((index, status, lead_name, context))
+
+    if not jobs:
+        print("🛑 No 'prospect' or 'new' rows in the CRM. Exiting to save resources.")
+        return
+
+    # Every company already in the CRM, so prospecting never adds (and later re-researches) one twice
+    known_leads = LeadIndex(records)
+
+    # Only now is the crew stack worth loading
+    from sales_crews import CachedSerperDevTool, prospect_leads, draft_outreach
+    import structured_output
+
+    # Each crew starts on its tier's model (flash for both sales crews); see model_router.py
+    router = ModelRouter(JOB, api_key, llm=llm)
+    search_tool = CachedSerperDevTool()
+
+    # Rows an interrupted run already paid crews for are taken from its checkpoint journal
+    journal = CheckpointJournal.for_job(JOB, session.source_kind)
+    keys = [journal.key(*job) for job in jobs]
+    resumed = sum(journal.output(key) is not None for key in keys)
+    if resumed:
+        print(f"♻️ Resuming {resumed} CRM tasks from the last run's checkpoint.")
+
+    def journal_output(key, done):
+        # Journal each output as soon as its crew is done, in case the run dies before the sheet writes
+        if done.exception() is None:
+            journal.record_output(key, done.result())
+
+    # 4. Run the crews in parallel
+    print(f"🚀 Running {len(jobs) - resumed} CRM tasks with up to {max_workers} workers...")
+    with instrumentation.stage(JOB, "crews", crews=len(jobs) - resumed, resumed=resumed, workers=max_workers):
+        # Every Gemini and Serper call waits its turn in the shared budgets (rate_limiter.py);
+        # a row whose crew still fails on a rate limit is requeued behind the others. This is the
+        # only crew-level retry for these rows: their crews are kicked off once (sales_crews.CREW_ATTEMPTS)
+        with RetryScheduler(max_workers=max_workers, max_attempts=instrumentation.KICKOFF_ATTEMPTS) as pool:
+            futures = []
+            for (index, status, lead_name, context), key in zip(jobs, keys):
+                saved = journal.output(key)
+                if saved is not None:
+                    future = Future()
+                    future.set_result(saved)
+                else:
+                    engine = prospect_leads if status == 'prospect' else draft_outreach
+                    future = pool.submit(engine, lead_name, context, router, search_tool)
+                    future.add_done_callback(functools.partial(journal_output, key))
+                futures.append(future)
+
+    # 5. Queue the results in CRM row order once every worker has finished
+    crm_writes = SheetWriteBuffer(sheet)
+    for (index, status, lead_name, context), future in zip(jobs, futures):
+        try:
+            output = future.result()
+        except Exception as e:
+            print(f"⚠️ Crew failed for {lead_name}: {e}")
+            continue
+
+        try:
+            if status == 'prospect':
+                if output:
+                    new_leads = known_leads.new_leads(output)
+                    if new_leads:
+                        crm_writes.append_rows(new_leads)
+                    crm_writes.update_cell(index, STATUS_COLUMN, "Prospecting Complete")
+                    found_leads_count += len(new_leads)
+                    print(f"✅ Found {len(new_leads)} new leads for {lead_name}! ({len(output) - len(new_leads)} already in the CRM)")
+            else:
+                crm_writes.update_cell(index, STATUS_COLUMN, "Drafted")
+                for col, value in enumerate(output, start=STATUS_COLUMN + 1):
+                    crm_writes.update_cell(index, col, value)
+                drafted_count += 1
+                print(f"✅ Successfully researched humans and drafted email for {lead_name}.")
         except Exception as e:
             print(f"⚠️ Failed to update row for {lead_name}: {e}")
 
-# 5. Notify the Founder
-if drafted_count > 0 or found_leads_count > 0:
     try:
-        primary_email = receiver_email.split(',')[0].strip()
-        msg = MIMEMultipart()
-        msg['From'] = f"Jom-Plan Sales Ops <{sender_email}>" 
-        msg['To'] = primary_email 
-        msg['Subject'] = f"✅ Sales Ops: {found_leads_count} Leads Found, {drafted_count} Drafted"
+        with instrumentation.stage(JOB, "sheet_write") as write:
+            crm_writes.flush()
+            write["requests"] = crm_writes.requests_sent
+        print(f"✍️ CRM updated in {crm_writes.requests_sent} Sheets requests.")
+        # Everything is in the sheet now; a failed flush keeps the journal for the next run to replay
+        journal.clear()
+    except Exception as e:
+        print(f"⚠️ Failed to write results to the CRM: {e}")
 
-        body = f"""
+    if known_leads.checked:
+        print(f"🧹 {known_leads.summary()}")
+        instrumentation.record(JOB, "lead_dedupe", 0.0, prospects=known_leads.checked,
+                               duplicates=known_leads.duplicates, duplicate_rate=round(known_leads.duplicate_rate, 3))
+    print(f"🧾 {structured_output.summary(JOB)}")
+    instrumentation.record(JOB, "parse", 0.0, **structured_output.totals(JOB))
+    print(f"🎚️ {model_router.summary(JOB)}")
+    print(f"🚦 {rate_limiter.summary()}")
+    print(f"🔎 {search_cache.summary()}")
+    instrumentation.record(JOB, "search", search_cache.stats["api_seconds"], backend=search_cache.BACKEND,
+                           hits=search_cache.stats["hits"], misses=search_cache.stats["misses"],
+                           coalesced=search_cache.stats["coalesced"])
+    print(f"🗄️ {cache_summary()}")
+
+    # 6. Notify the Founder
+    if drafted_count > 0 or found_leads_count > 0:
+        try:
+            primary_email = receiver_email.split(',')[0].strip()
+
+            body = f"""
         <html>
           <body style="font-family: Arial, sans-serif; color: #333;">
             <h2>Sales Operations Update</h2>
             <p>I scoured the web and found <b>{found_leads_count}</b> new target businesses.</p>
+            <p>I skipped <b>{known_leads.duplicates}</b> businesses that were already in your CRM ({known_leads.duplicate_rate:.0%} of those found).</p>
             <p>I also researched decision-makers and drafted highly targeted cold emails for <b>{drafted_count}</b> specific leads.</p>
             <p>Please review your CRM and approve the drafts!</p>
           </body>
         </html>
         """
-        msg.attach(MIMEText(body, 'html'))
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password) 
-        server.sendmail(sender_email, primary_email, msg.as_string()) 
-        server.quit()
-    except Exception as e:
-        print(f"❌ Failed to send notification email: {e}")
+            with instrumentation.stage(JOB, "email") as delivery:
+                delivery["retries"] = send_html_email(f"✅ Sales Ops: {found_leads_count} Leads Found, {drafted_count} Drafted", body, primary_email, "Jom-Plan Sales Ops", mailer)
+        except Exception as e:
+            print(f"❌ Failed to send notification email: {e}")
+
+    print(f"📏 {instrumentation.summary(JOB)}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from kv_cache import KeyValueCache
+from paths import CACHE_DIR
+
+# Web search results, shared by every worker thread and every daily run
+CACHE_PATH = os.path.join(CACHE_DIR, "search_results.sqlite")
+TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_HOURS", "168")) * 3600
+MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+
+# SEARCH_BACKEND=stub answers every search with canned results and never calls Serper (for offline runs)
+BACKEND = os.environ.get("SEARCH_BACKEND", "serper").lower()
+
+stats = {"hits": 0, "misses": 0, "coalesced": 0, "api_seconds": 0.0}
+
+_store = KeyValueCache(CACHE_PATH, ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES)
+_lock = threading.Lock()
+_in_flight = {}  # key -> Future of the request already under way for it
+
+
+def search_key(query, search_type, **options):
+    """Hash of a search: the query (case and spacing ignored), its type and the tool's result options."""
+    normalized = " ".join(str(query).lower().split())
+    return hashlib.sha256(json.dumps([normalized, search_type, options], sort_keys=True).encode()).hexdigest()
+
+
+def cached_search(key, fetch):
+    """`fetch()`'s JSON-able result, served from the cache while fresh.
+
+    Concurrent calls for the same key share one `fetch()`: the first caller makes
+    the request and the others wait for its answer (or its exception).
+    """
+    with _lock:
+        value = _store.get(key)
+        if value is not None:
+            stats["hits"] += 1
+            return value
+        pending = _in_flight.get(key)
+        if pending is None:
+            pending = _in_flight[key] = Future()
+            owner = True
+            stats["misses"] += 1
+        else:
+            owner = False
+            stats["coalesced"] += 1
+
+    if not owner:
+        return pending.result()
+
+    started = time.perf_counter()
+    try:
+        value = fetch()
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    else:
+        pending.set_result(value)
+        _store.put(key, value)
+        return value
+    finally:
+        with _lock:
+            stats["api_seconds"] += time.perf_counter() - started
+            _in_flight.pop(key, None)
+
+
+def stub_results(query, search_type="search"):
+    """Serper-shaped canned results for `query`, so crews can run without the network or an API key."""
+    slug = "-".join(str(query).lower().split())[:40] or "empty"
+    kind = "news" if search_type == "news" else "organic"
+    return {
+        "searchParameters": {"q": query, "type": search_type, "engine": "stub"},
+        kind: [
+            {
+                "title": f"{query} - result {i}",
+                "link": f"https://example.com/{slug}/{i}",
+                "snippet": f"Offline stub result {i} for '{query}'.",
+                "position": i,
+            }
+            for i in range(1, 4)
+        ],
+    }
+
+
+def summary():
+    total = stats["hits"] + stats["misses"] + stats["coalesced"]
+    return (f"{stats['hits']}/{total} web searches served from cache, {stats['coalesced']} shared an in-flight "
+            f"request, {stats['misses']} went to {BACKEND} ({stats['api_seconds']:.1f}s)")
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import sqlite3
+import pandas as pd
+from gspread.utils import numericise_all, rowcol_to_a1
+from paths import CACHE_DIR
+
+# Rows per Sheets read during sync, and per SQLite batch when loading frames,
+# so memory stays bounded by the chunk rather than the size of the sheet
+CHUNK_ROWS = int(os.environ.get("SNAPSHOT_CHUNK_ROWS", "5000"))
+
+# Text columns are stored as Arrow strings, or as categories when values repeat a lot
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = "string"
+CATEGORY_MAX_RATIO = 0.5
+
+# Dtypes for the JomPlan feedback form (headers in row 2). The column names are assumed
+# from the form's fields, not read from it: only "Timestamp" is known for sure, and a
+# name that does not match simply falls back to the category heuristic, like any
+# column added later. Ratings are Float64 so a half star ("4.5") still loads.
+FEEDBACK_SCHEMA = {
+    "Location": "category",
+    "Rating": "Float64",
+    "Feedback": TEXT_DTYPE,
+    "Email": TEXT_DTYPE,
+}
+
+
+class SheetSnapshot:
+    """Local SQLite copy of an append-only Google Sheet, keyed by row number and timestamp.
+
+    `sync()` only downloads the rows appended since the previous sync. A changed
+    header row, a last synced row that no longer matches the sheet (rows were
+    deleted or edited above it) or SNAPSHOT_FULL_SYNC=1 throws the copy away and
+    re-downloads everything, which is also the way to pick up edits to older rows.
+    """
+
+    def __init__(self, path, header_row=1, timestamp_column="Timestamp", schema=None):
+        self.path = path
+        self.header_row = header_row
+        self.timestamp_column = timestamp_column
+        # Explicit dtypes by column name (e.g. {"Rating": "Float64", "Location": "category"});
+        # other text columns get TEXT_DTYPE, or 'category' when few of their values are distinct
+        self.schema = schema or {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS rows (row_number INTEGER PRIMARY KEY, ts TEXT, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS rows_ts ON rows (ts);
+        """)
+
+    @classmethod
+    def for_sheet(cls, sheet_id, source_kind="gsheets", **kwargs):
+        """The snapshot of one sheet as read from one kind of data source (see data_sources.py)."""
+        return cls(os.path.join(CACHE_DIR, f"sheet_{source_kind}_{sheet_id}.sqlite"), **kwargs)
+
+    @property
+    def columns(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'header'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    def row_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def sync(self, sheet):
+        """Pulls rows appended to `sheet` since the last sync. Returns how many were added."""
+        header = [name.strip() for name in sheet.row_values(self.header_row)]
+        if self.timestamp_column not in header:
+            raise KeyError(f"'{self.timestamp_column}' column not found in {header}")
+
+        if header != self.columns or os.environ.get("SNAPSHOT_FULL_SYNC") == "1":
+            with self.db:
+                self.db.execute("DELETE FROM rows")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('header', ?)", (json.dumps(header),))
+
+        last_row = self.db.execute("SELECT MAX(row_number) FROM rows").fetchone()[0] or self.header_row
+        last_col = re.sub(r"\d", "", rowcol_to_a1(1, len(header)))
+
+        # Appends never move the last synced row; a deletion or edit above it does
+        if last_row > self.header_row and not self._row_matches(sheet, header, last_row, last_col):
+            print("♻️ Rows changed above the last sync (deleted or edited); re-downloading the whole sheet.")
+            with self.db:
+                self.db.execute("DELETE FROM rows")
+            last_row = self.header_row
+        grid_rows = getattr(sheet, "row_count", None)
+
+        # Read the new rows a chunk at a time rather than as one huge download
+        added = 0
+        start = last_row + 1
+        while grid_rows is None or start <= grid_rows:
+            end = start + CHUNK_ROWS - 1
+            values = sheet.get_values(f"{rowcol_to_a1(start, 1)}:{last_col}{end}")
+            if values:
+                self._insert(start, header, values)
+                added += len(values)
+            if grid_rows is None and len(values) < CHUNK_ROWS:
+                break
+            start = end + 1
+        return added
+
+    def _row_matches(self, sheet, header, row_number, last_col):
+        values = sheet.get_values(f"{rowcol_to_a1(row_number, 1)}:{last_col}{row_number}")
+        stored = self.db.execute("SELECT data FROM rows WHERE row_number = ?", (row_number,)).fetchone()
+        return bool(values) and stored is not None and json.dumps(self._records(header, values[:1])[0], default=str) == stored[0]
+
+    @staticmethod
+    def _records(header, values):
+        return [dict(zip(header, numericise_all(row + [""] * (len(header) - len(row))))) for row in values]
+
+    def _insert(self, first_row, header, values):
+        records = self._records(header, values)
+        timestamps = pd.to_datetime(
+            pd.Series([record[self.timestamp_column] for record in records], dtype="object").astype(str),
+            dayfirst=True, errors="coerce",
+        )
+
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                [
+                    (first_row + offset, None if pd.isna(ts) else ts.isoformat(), json.dumps(record, default=str))
+                    for offset, (record, ts) in enumerate(zip(records, timestamps))
+                ],
+            )
+
+    def since(self, timestamp):
+        """Rows whose timestamp is at or after `timestamp`, in sheet order."""
+        return self._load("WHERE ts >= ? ORDER BY row_number", (timestamp.isoformat(),))
+
+    def tail(self, n):
+        """The last `n` rows of the sheet, in sheet order."""
+        first = self.db.execute(
+            "SELECT row_number FROM rows ORDER BY row_number DESC LIMIT 1 OFFSET ?", (max(n - 1, 0),)
+        ).fetchone()
+        return self._load("WHERE row_number >= ? ORDER BY row_number", (first[0] if first else 0,))
+
+    def windows(self, timestamp, history_rows):
+        """(history, recent): the `history_rows` rows before the first row at or after `timestamp`,
+        and every row from there on.
+
+        Both come from one typed frame as `iloc` slices, so they share its memory
+        instead of each holding a copy. Rows are taken in sheet order, which for an
+        append-only form sheet is also time order.
+        """
+        split = self._split(timestamp)
+        first = split
+        if history_rows:
+            first = self.db.execute(
+                "SELECT row_number FROM rows WHERE row_number < ? ORDER BY row_number DESC LIMIT 1 OFFSET ?",
+                (split, history_rows - 1),
+            ).fetchone()
+            # Fewer than `history_rows` rows before the split: take all of them
+            first = first[0] if first else 0
+
+        df = self._load("WHERE row_number >= ? ORDER BY row_number", (first,))
+        position = int(df.index.searchsorted(split))
+        return df.iloc[:position], df.iloc[position:]
+
+    def before(self, timestamp):
+        """Every row before the first row at or after `timestamp`, as typed frames of up to CHUNK_ROWS rows.
+
+        A generator, so the whole history can be streamed (e.g. into shards) without
+        holding it in memory. Text columns stay strings rather than categories.
+        """
+        cursor = self.db.execute(
+            "SELECT row_number, ts, data FROM rows WHERE row_number < ? ORDER BY row_number", (self._split(timestamp),)
+        )
+        while True:
+            batch = cursor.fetchmany(CHUNK_ROWS)
+            if not batch:
+                break
+            yield self._typed_chunk(batch)
+
+    def _split(self, timestamp):
+        # First row at or after `timestamp`, or one past the last row when there is none
+        split = self.db.execute("SELECT MIN(row_number) FROM rows WHERE ts >= ?", (timestamp.isoformat(),)).fetchone()[0]
+        return split or (self.db.execute("SELECT MAX(row_number) FROM rows").fetchone()[0] or 0) + 1
+
+    def _load(self, where, params):
+        # Build the frame a chunk at a time so only one chunk of raw JSON is alive at once
+        cursor = self.db.execute(f"SELECT row_number, ts, data FROM rows {where}", params)
+        chunks = []
+        while True:
+            batch = cursor.fetchmany(CHUNK_ROWS)
+            if not batch:
+                break
+            chunks.append(self._typed_chunk(batch))
+        if not chunks:
+            return self._typed_chunk([])
+        df = pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+        return self._categorize(df)
+
+    def _typed_chunk(self, batch):
+        columns = self.columns
+        df = pd.DataFrame([json.loads(data) for _, _, data in batch], columns=columns,
+                          index=pd.Index([row_number for row_number, _, _ in batch], name="row"))
+        for column in columns:
+            if column == self.timestamp_column:
+                df[column] = pd.to_datetime([ts for _, ts, _ in batch], format="ISO8601")
+            else:
+                dtype = self.schema.get(column, TEXT_DTYPE)
+                if dtype == "category":
+                    # Category conversion waits until every chunk is in, so the categories line up
+                    df[column] = df[column].astype(TEXT_DTYPE)
+                elif pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+                    # Blank or malformed cells in a numeric column become missing values, and so
+                    # do fractions in an integer one, which could not be cast without losing them
+                    values = pd.to_numeric(df[column], errors="coerce")
+                    if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(dtype)):
+                        values = values.where(values % 1 == 0)
+                    df[column] = values.astype(dtype)
+                else:
+                    df[column] = df[column].astype(dtype)
+        return df
+
+    def _categorize(self, df):
+        for column in df.columns:
+            if column == self.timestamp_column or str(df[column].dtype) not in ("string", "str"):
+                continue
+            wanted = self.schema.get(column)
+            if wanted == "category" or (wanted is None and df[column].nunique() <= len(df) * CATEGORY_MAX_RATIO):
+                df[column] = df[column].astype("category")
+        return df
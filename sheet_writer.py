@@ -0,0 +1,75 @@
+import os
+from gspread.utils import rowcol_to_a1
+
+# Pending mutations that trigger an automatic flush
+DEFAULT_FLUSH_THRESHOLD = int(os.environ.get("SHEET_FLUSH_THRESHOLD", "200"))
+
+
+class SheetWriteBuffer:
+    """Queues cell updates and row appends for one worksheet and sends them in bulk.
+
+    Cell updates are grouped into a single `batch_update` call (neighbouring
+    cells on the same row share one range) and appended rows go out in a
+    single `append_rows` call, instead of one HTTP round trip per cell.
+    """
+
+    def __init__(self, sheet, flush_threshold=DEFAULT_FLUSH_THRESHOLD):
+        self.sheet = sheet
+        self.flush_threshold = flush_threshold
+        self.requests_sent = 0
+        self._cells = {}
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def update_cell(self, row, col, value):
+        # A later write to the same cell replaces the queued one
+        self._cells[(row, col)] = value
+        self._flush_if_full()
+
+    def append_rows(self, rows):
+        self._rows.extend(rows)
+        self._flush_if_full()
+
+    def pending(self):
+        return len(self._cells) + len(self._rows)
+
+    def flush(self):
+        """Sends everything queued so far. Failed writes stay queued for the next flush."""
+        # Rows go first, so a status cell never claims rows were added when the append failed
+        if self._rows:
+            self.sheet.append_rows(self._rows)
+            self.requests_sent += 1
+            self._rows = []
+        if self._cells:
+            # USER_ENTERED matches what gspread's update_cell does for single cells
+            self.sheet.batch_update(self._cell_ranges(), value_input_option="USER_ENTERED")
+            self.requests_sent += 1
+            self._cells = {}
+
+    def _flush_if_full(self):
+        if self.pending() >= self.flush_threshold:
+            self.flush()
+
+    def _cell_ranges(self):
+        runs = []
+        for row, col in sorted(self._cells):
+            value = self._cells[(row, col)]
+            last = runs[-1] if runs else None
+            if last and last["row"] == row and last["end_col"] == col - 1:
+                last["end_col"] = col
+                last["values"].append(value)
+            else:
+                runs.append({"row": row, "start_col": col, "end_col": col, "values": [value]})
+
+        return [
+            {
+                "range": f"{rowcol_to_a1(run['row'], run['start_col'])}:{rowcol_to_a1(run['row'], run['end_col'])}",
+                "values": [run["values"]],
+            }
+            for run in runs
+        ]
@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import threading
+from collections import Counter
+from typing import Literal
+from pydantic import BaseModel, Field, ValidationError
+import instrumentation
+
+# Crews are asked for JSON matching these models and their answers are validated here.
+# (Not through crewai's `output_pydantic`: its converter spends another LLM call on every
+# output and raises, losing the whole row, when an answer cannot be converted.)
+# STRUCTURED_OUTPUT=off goes back to the line formats in the prompts; both are validated the same way.
+ENABLED = os.environ.get("STRUCTURED_OUTPUT", "on").lower() != "off"
+
+REPAIR_PROMPT = """The text below was meant to follow a fixed structure but does not. Rewrite it into the requested structure.
+Use only the information in the text: do not research, guess or add anything. If the text has nothing for a required field, write "Not found.".
+
+{instructions}
+
+TEXT:
+{raw}"""
+
+
+class Prospect(BaseModel):
+    company: str = Field(min_length=1, description="Company name")
+    url: str = Field(min_length=1, description="Website URL")
+    description: str = Field("", description="1-sentence description of what they do")
+
+
+# "low" answers from the flash model are redone on pro (see model_router.py)
+Confidence = Literal["high", "medium", "low"]
+
+
+class ProspectList(BaseModel):
+    prospects: list[Prospect] = Field(min_length=1)
+    confidence: Confidence = Field("high", description="How sure you are that every business is real and matches the niche")
+
+
+class OutreachDraft(BaseModel):
+    viability: str = Field(min_length=1, description="1 paragraph viability assessment")
+    contact_name: str = Field(min_length=1, description="Name and role of the decision maker, or 'General Manager / Team'")
+    contact_info: str = Field(min_length=1, description="Email address or LinkedIn profile, or 'Not found publicly'")
+    email: str = Field(min_length=1, description="The full cold email: subject line, greeting, body and sign-off")
+    confidence: Confidence = Field("high", description="How sure you are of the viability assessment and the decision maker")
+
+
+class ExportTask(BaseModel):
+    platform: str = Field(min_length=1, description="Platform name")
+    description: str = Field(min_length=1, description="Short 1-sentence description of the task")
+
+
+class ExportPlan(BaseModel):
+    tasks: list[ExportTask] = Field(min_length=1)
+
+
+def instructions(model):
+    """Prompt text asking for a bare JSON object that validates as `model`."""
+    return ("Reply with only a JSON object (no markdown fences, no commentary) matching this JSON schema:\n"
+            + json.dumps(model.model_json_schema()))
+
+
+_lock = threading.Lock()
+_counts = {}  # job -> Counter of parsed / repaired / failed
+
+
+def validated(output, model, legacy_parser=None):
+    """A task output as a `model` instance, or None when neither its JSON nor its legacy format validates."""
+    if isinstance(getattr(output, "pydantic", None), model):
+        return output.pydantic
+    raw = getattr(output, "raw", output) or ""
+    match = re.search(r"\{.*\}", raw, re.DOTALL)
+    if match:
+        try:
+            return model.model_validate_json(match.group(0))
+        except ValidationError:
+            pass
+    if legacy_parser is not None:
+        try:
+            return legacy_parser(raw)
+        except (ValidationError, ValueError):
+            pass
+    return None
+
+
+def parse(job, output, model, llm, legacy_parser=None):
+    """`output` as a validated `model`. A failed parse re-asks only the formatting step (no tools, no research).
+
+    Returns None when the repair fails too. Every outcome is counted towards the job's parse-failure rate.
+    """
+    result = validated(output, model, legacy_parser)
+    outcome = "parsed"
+    if result is None:
+        print(f"🧾 {model.__name__} did not validate; asking for a reformat only...")
+        result = repair(job, getattr(output, "raw", output), model, llm, legacy_parser)
+        outcome = "repaired" if result is not None else "failed"
+    with _lock:
+        _counts.setdefault(job, Counter())[outcome] += 1
+    return result
+
+
+def repair(job, raw, model, llm, legacy_parser=None):
+    """One cheap, tool-less crew that restructures `raw` into `model`; None if that fails too."""
+    from crewai import Agent, Task, Crew
+
+    formatter = Agent(
+        role="Output Formatter",
+        goal="Turn free-form answers into the exact structure the next step needs.",
+        backstory="You restructure text precisely. You never research, and you never invent facts.",
+        llm=llm
+    )
+    task = Task(
+        description=REPAIR_PROMPT.format(instructions=instructions(model), raw=raw),
+        expected_output=f"The same information as a {model.__name__} JSON object.",
+        agent=formatter
+    )
+    try:
+        instrumentation.kickoff(job, Crew(agents=[formatter], tasks=[task]))
+    except Exception as e:
+        print(f"⚠️ Reformat failed: {e}")
+        return None
+    return validated(task.output, model, legacy_parser)
+
+
+def totals(job):
+    """Parse outcomes for a job, with the share that needed a repair or failed outright."""
+    with _lock:
+        counts = Counter(_counts.get(job, {}))
+    outputs = sum(counts.values())
+    failure_rate = (counts["repaired"] + counts["failed"]) / outputs if outputs else 0.0
+    return {"outputs": outputs, "parsed": counts["parsed"], "repaired": counts["repaired"],
+            "failed": counts["failed"], "parse_failure_rate": round(failure_rate, 3)}
+
+
+def summary(job):
+    t = totals(job)
+    return (f"{t['parsed']}/{t['outputs']} crew outputs parsed first time, {t['repaired']} repaired, "
+            f"{t['failed']} failed ({t['parse_failure_rate']:.0%} parse-failure rate)")
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from data_sources import LocalFileSource
+
+
+def test_parquet_cells_look_like_sheets_cells(tmp_path):
+    pd.DataFrame({
+        "Timestamp": ["01/01/2025 10:00:00", "02/01/2025 10:00:00"],
+        "Rating": [5, None],
+        "Feedback": ["ok", None],
+    }).to_parquet(tmp_path / "feedback.parquet")
+
+    sheet = LocalFileSource(str(tmp_path), header_rows={"feedback": 2}).worksheet("feedback")
+
+    assert sheet.rows[2:] == [["01/01/2025 10:00:00", "5", "ok"], ["02/01/2025 10:00:00", "", ""]]
+    assert sheet.get_all_records(head=2)[1] == {"Timestamp": "02/01/2025 10:00:00", "Rating": "", "Feedback": ""}
@@ -0,0 +1,22 @@
+import pytest
+
+from lead_index import LeadIndex, domain_of
+
+
+@pytest.mark.parametrize("text, domain", [
+    ("https://www.jom.my/about - Boutique hotel", "jom.my"),
+    ("https://m.jom.my", "jom.my"),
+    ("https://m.facebook.com/hotelb", None),
+    ("web.facebook.com/hotelb", None),
+    ("https://sites.google.com/view/hotelb", None),
+    ("https://maps.app.goo.gl/abc", None),
+    ("Penang", None),
+])
+def test_domain_of(text, domain):
+    assert domain_of(text) == domain
+
+
+def test_shared_host_subdomains_do_not_make_duplicates():
+    index = LeadIndex([{"Lead Name / Niche": "Hotel A", "Website or Location/Context": "https://m.facebook.com/hotela"}])
+    row = ["Hotel B", "https://m.facebook.com/hotelb - Boutique inn", "New", "", "", "", ""]
+    assert index.new_leads([row]) == [row]
@@ -0,0 +1,98 @@
+import smtplib
+import socket
+
+import pytest
+
+import mailer
+from mailer import Mailer, is_transient
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+    smtplib.SMTPResponseException(421, b"Service not available"),
+    smtplib.SMTPDataError(451, b"Local error in processing"),
+    socket.timeout("timed out"),
+    ConnectionResetError("reset by peer"),
+])
+def test_transient_errors_are_retried(error):
+    assert is_transient(error)
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPRecipientsRefused({"a@x": (550, b"No such user")}),
+    smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server."),
+    smtplib.SMTPAuthenticationError(535, b"Username and Password not accepted"),
+    smtplib.SMTPSenderRefused(553, b"Sender address rejected", "s@x"),
+    ValueError("not a network error"),
+])
+def test_permanent_errors_are_not_retried(error):
+    assert not is_transient(error)
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every delivered message with its session, refusing the first `fail_first` with a 451."""
+
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.delivered = []  # (session, envelope)
+        self.sessions = []   # every SMTP session a message was started on
+
+    async def handle_MAIL(self, server, session, envelope, address, mail_options):
+        if session not in self.sessions:
+            self.sessions.append(session)
+        envelope.mail_from = address
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_first:
+            self.fail_first -= 1
+            return "451 Try again later"
+        self.delivered.append((session, envelope))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    started = []
+
+    def start(handler):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        started.append(controller)
+        return port
+
+    yield start
+    for controller in started:
+        controller.stop()
+
+
+def test_queued_messages_share_one_session(smtp_server):
+    handler = RecordingHandler()
+    port = smtp_server(handler)
+
+    with Mailer("s@example.com", None, host="127.0.0.1", port=port, starttls=False) as outbox:
+        for n in range(3):
+            outbox.send_html(f"Update {n}", "<p>hi</p>", ["a@example.com", "b@example.com"], "Jom-Plan")
+
+    assert outbox.sent == 3 and outbox.retries == 0
+    assert len(handler.sessions) == 1 and len(handler.delivered) == 3
+    assert all(envelope.rcpt_tos == ["a@example.com", "b@example.com"] for _, envelope in handler.delivered)
+
+
+def test_4xx_reply_reconnects_and_retries(smtp_server, monkeypatch):
+    monkeypatch.setattr(mailer, "BACKOFF_SECONDS", 0)
+    handler = RecordingHandler(fail_first=1)
+    port = smtp_server(handler)
+
+    with Mailer("s@example.com", None, host="127.0.0.1", port=port, starttls=False) as outbox:
+        outbox.send_html("Update", "<p>hi</p>", "a@example.com", "Jom-Plan")
+        outbox.send_html("Update", "<p>hi</p>", "a@example.com", "Jom-Plan")
+
+    assert outbox.sent == 2 and outbox.retries == 1
+    # The 451 dropped the first session; both messages went out over the one opened after it
+    assert len(handler.sessions) == 2
+    assert [session for session, _ in handler.delivered] == [handler.sessions[1]] * 2
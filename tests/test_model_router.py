@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import model_router
+from model_router import ModelRouter
+
+
+def run_outreach(monkeypatch, flash_answer):
+    monkeypatch.setattr(model_router, "build_llm", lambda api_key, model: model)
+    records = []
+    monkeypatch.setattr(model_router.instrumentation, "record", lambda job, stage, seconds, **fields: records.append(fields))
+    models = []
+
+    def attempt(llm):
+        models.append(llm)
+        answer = flash_answer if llm == model_router.MODELS["flash"] else SimpleNamespace(confidence="high")
+        return answer, "raw text"
+
+    ModelRouter("test", "key").run("outreach", attempt, answer=lambda result: result[0])
+    return models, records
+
+
+def test_confident_flash_answer_is_kept(monkeypatch):
+    models, records = run_outreach(monkeypatch, SimpleNamespace(confidence="medium"))
+    assert models == [model_router.MODELS["flash"]] and records == []
+
+
+def test_invalid_answer_inside_a_tuple_is_escalated_as_invalid(monkeypatch):
+    models, records = run_outreach(monkeypatch, None)
+    assert models == [model_router.MODELS["flash"], model_router.MODELS["pro"]]
+    assert records == [{"task": "outreach", "reason": "invalid"}]
+
+
+def test_low_confidence_answer_is_escalated(monkeypatch):
+    _, records = run_outreach(monkeypatch, SimpleNamespace(confidence="low"))
+    assert records == [{"task": "outreach", "reason": "low_confidence"}]
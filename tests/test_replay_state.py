@@ -0,0 +1,23 @@
+import os
+
+import checkpoint
+import preflight
+from checkpoint import CheckpointJournal
+
+
+def test_replay_checkpoints_are_not_resumed_by_live_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CACHE_DIR", str(tmp_path))
+    CheckpointJournal.for_job("sales", "csv-export").record_output("row", ["offline draft"])
+
+    assert CheckpointJournal.for_job("sales", "csv-export").output("row") == ["offline draft"]
+    assert CheckpointJournal.for_job("sales").output("row") is None
+
+
+def test_replay_preflight_does_not_skip_live_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(preflight, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(preflight, "STATE_PATH", os.path.join(str(tmp_path), "preflight_{source_kind}.json"))
+    monkeypatch.setattr(preflight, "FORCE_RUN", False)
+    preflight.remember("cmo_guide", "digest", "local")
+
+    assert preflight.unchanged("cmo_guide", "digest", "local")
+    assert not preflight.unchanged("cmo_guide", "digest")
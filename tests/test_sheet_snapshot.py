@@ -0,0 +1,33 @@
+import pandas as pd
+
+from data_sources import MemoryWorksheet
+from sheet_snapshot import SheetSnapshot, FEEDBACK_SCHEMA
+
+
+def feedback_sheet(ratings):
+    rows = [["Instructions"], ["Timestamp", "Location", "Rating", "Feedback", "Email"]]
+    for day, rating in enumerate(ratings, start=1):
+        rows.append([f"{day:02d}/01/2025 10:00:00", "Penang", rating, "ok", "a@example.com"])
+    return MemoryWorksheet(rows)
+
+
+def test_fractional_and_malformed_ratings_still_load(tmp_path):
+    snapshot = SheetSnapshot(str(tmp_path / "feedback.sqlite"), header_row=2, schema=FEEDBACK_SCHEMA)
+    snapshot.sync(feedback_sheet(["5", "4.5", "", "great"]))
+
+    history, recent = snapshot.windows(pd.Timestamp("2025-01-02"), history_rows=10)
+
+    assert history["Rating"].tolist() == [5.0]
+    assert recent["Rating"].tolist()[0] == 4.5
+    assert recent["Rating"].isna().tolist() == [False, True, True]
+
+
+def test_integer_schema_drops_fractions_instead_of_failing(tmp_path):
+    snapshot = SheetSnapshot(str(tmp_path / "feedback.sqlite"), header_row=2, schema={"Rating": "Int64"})
+    snapshot.sync(feedback_sheet(["5", "4.5"]))
+
+    ratings = snapshot.since(pd.Timestamp("2025-01-01"))["Rating"]
+
+    assert str(ratings.dtype) == "Int64"
+    assert ratings.isna().tolist() == [False, True]
+    assert ratings.iloc[0] == 5
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+from clients import open_session
+from mailer import Mailer
+import instrumentation
+import autonomous_worker
+import cmo_guide
+import sales_ops
+
+# Run any subset in one process: python workforce.py [engineering] [cmo] [sales]
+STAGES = {
+    "engineering": autonomous_worker.run,
+    "cmo": cmo_guide.run,
+    "sales": sales_ops.run,
+}
+
+# The first of these that is set must belong to a service account that can open every sheet
+CREDENTIAL_ENV_VARS = (
+    "WORKFORCE_GOOGLE_CREDENTIALS_JSON",
+    "GOOGLE_CREDENTIALS_JSON",
+    "CMO_GOOGLE_CREDENTIALS_JSON",
+    "SALES_GOOGLE_CREDENTIALS_JSON",
+)
+
+
+def main(stage_names, source=None):
+    stage_names = stage_names or list(STAGES)
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        print(f"❌ Unknown stage(s): {', '.join(unknown)}. Choose from: {', '.join(STAGES)}")
+        return 2
+
+    timings = []
+    failed = []
+
+    # 1. Shared clients: one Google login and one SMTP session for every stage.
+    #    Stages share one LLM per model tier through build_llm(), which only loads crewai once a stage has work.
+    started = time.perf_counter()
+    try:
+        print("🔐 Authenticating the workforce with Google Cloud...")
+        session = open_session(*CREDENTIAL_ENV_VARS, source=source)
+    except Exception as e:
+        print(f"❌ Authentication Failed: {e}")
+        return 1
+    timings.append(("setup", time.perf_counter() - started))
+    instrumentation.record("workforce", "auth", timings[-1][1], status="ok")
+
+    # 2. Run the stages back to back; one failing stage does not stop the others
+    with Mailer(os.environ.get("SENDER_EMAIL"), os.environ.get("SENDER_PASSWORD")) as mailer:
+        for name in stage_names:
+            print(f"\n▶️ Stage: {name}")
+            started = time.perf_counter()
+            try:
+                STAGES[name](session=session, mailer=mailer)
+            except Exception as e:
+                print(f"❌ Stage '{name}' failed: {e}")
+                failed.append(name)
+            timings.append((name, time.perf_counter() - started))
+            instrumentation.record("workforce", name, timings[-1][1], status="failed" if name in failed else "ok")
+
+    # 3. Report where the time went
+    print("\n⏱️ Stage timings:")
+    for name, seconds in timings:
+        print(f"   {name:<12} {seconds:8.1f}s{'  (failed)' if name in failed else ''}")
+    print(f"   {'total':<12} {sum(seconds for _, seconds in timings):8.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))